@@ -0,0 +1,215 @@
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Chữ ký đầu file: nhận dạng theo nội dung thay vì đuôi file
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+SEVEN_ZIP_MAGIC = b"7z\xbc\xaf\x27\x1c"
+
+DEFAULT_WORKERS = 4
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def detect_format(path):
+    """'zip', '7z' hoặc None theo các byte đầu file"""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head.startswith(ZIP_MAGIC):
+        return "zip"
+    if head.startswith(SEVEN_ZIP_MAGIC):
+        return "7z"
+    return None
+
+
+def file_crc32(path):
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def is_unchanged(path, size, crc):
+    """File đích đã có, đúng dung lượng và CRC (crc None = chỉ so dung lượng)"""
+    try:
+        if os.path.getsize(path) != size:
+            return False
+    except OSError:
+        return False
+    return crc is None or file_crc32(path) == crc
+
+
+def safe_target(target_dir, name):
+    """Đường dẫn đích của một member; chặn tên kiểu '../' thoát ra ngoài thư mục đích"""
+    root = os.path.abspath(target_dir)
+    dest = os.path.abspath(os.path.join(root, name))
+    if os.path.commonpath([root, dest]) != root:
+        raise ArchiveError(f"Tên file không hợp lệ trong archive: {name}")
+    return dest
+
+
+class _Progress:
+    """Đếm member đã xong (giải nén hoặc bỏ qua) và báo về on_progress(done, total, name, skipped)"""
+
+    def __init__(self, total, on_progress):
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def member_done(self, name, skipped=False):
+        with self._lock:
+            self.done += 1
+            if skipped:
+                self.skipped += 1
+            done = self.done
+        if self._on_progress:
+            self._on_progress(done, self.total, name, skipped)
+
+
+def _extract_zip(path, target_dir, workers, on_progress, stop_event):
+    import zipfile
+
+    with zipfile.ZipFile(path) as z:
+        members = [info for info in z.infolist() if not info.is_dir()]
+    progress = _Progress(len(members), on_progress)
+    todo = [(info, safe_target(target_dir, info.filename)) for info in members]
+
+    # Mỗi thread một handle ZipFile riêng: đọc / giải nén song song, không tranh nhau con trỏ file
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract_one(info, dest):
+        if stop_event is not None and stop_event.is_set():
+            return
+        # Kiểm tra CRC file đã có cũng chạy song song trong pool
+        if is_unchanged(dest, info.file_size, info.CRC):
+            progress.member_done(info.filename, skipped=True)
+            return
+        z = getattr(local, "zip", None)
+        if z is None:
+            z = local.zip = zipfile.ZipFile(path)
+            with handles_lock:
+                handles.append(z)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.part"
+        try:
+            # Giải nén theo luồng ra file tạm (ZipExtFile tự kiểm CRC khi đọc hết) rồi đổi tên
+            with z.open(info) as src, open(tmp, "wb") as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        progress.member_done(info.filename)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(extract_one, info, dest) for info, dest in todo]:
+                future.result()
+    finally:
+        for z in handles:
+            z.close()
+    return progress
+
+
+def _extract_7z(path, target_dir, workers, on_progress, stop_event):
+    import py7zr
+    from py7zr.callbacks import ExtractCallback
+
+    with py7zr.SevenZipFile(path, mode="r") as z:
+        members = [info for info in z.list() if not info.is_directory]
+        solid = z.archiveinfo().solid
+    progress = _Progress(len(members), on_progress)
+    dests = [safe_target(target_dir, info.filename) for info in members]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        unchanged = list(pool.map(lambda m: is_unchanged(m[1], m[0].uncompressed, m[0].crc32), zip(members, dests)))
+    todo = []
+    for info, same in zip(members, unchanged):
+        if same:
+            progress.member_done(info.filename, skipped=True)
+        else:
+            todo.append(info.filename)
+    if not todo:
+        return progress
+    pending = set(todo)
+    pending_lock = threading.Lock()
+
+    class Callback(ExtractCallback):
+        def report_start_preparation(self):
+            pass
+
+        def report_start(self, processing_file_path, processing_bytes):
+            pass
+
+        def report_update(self, decompressed_bytes):
+            pass
+
+        def report_end(self, processing_file_path, wrote_bytes):
+            # py7zr báo cả thư mục và các member bị lướt qua trong khối solid: chỉ đếm file cần giải nén
+            with pending_lock:
+                if processing_file_path not in pending:
+                    return
+                pending.discard(processing_file_path)
+            progress.member_done(processing_file_path)
+
+        def report_postprocess(self):
+            pass
+
+        def report_warning(self, message):
+            print(f"Cảnh báo giải nén: {message}")
+
+    def extract_group(names):
+        if stop_event is not None and stop_event.is_set():
+            return
+        # py7zr ghi thẳng từng member ra đĩa, không giữ cả archive trong RAM
+        with py7zr.SevenZipFile(path, mode="r") as z:
+            z.extract(path=target_dir, targets=names, callback=Callback())
+
+    # Archive solid phải giải nén tuần tự từ đầu khối, chia nhóm chỉ làm giải nén lặp lại
+    groups = [todo] if solid or workers <= 1 else [todo[i::workers] for i in range(workers) if todo[i::workers]]
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        for future in [pool.submit(extract_group, names) for names in groups]:
+            future.result()
+    return progress
+
+
+def extract_archive(path, target_dir, workers=DEFAULT_WORKERS, on_progress=None, stop_event=None):
+    """
+    Giải nén .zip / .7z (nhận dạng theo chữ ký đầu file) thẳng ra `target_dir`.
+    Các member được giải nén song song bởi `workers` thread, đọc ghi theo luồng nên archive
+    nhiều GB không bị nạp vào RAM. Member đã có trên đĩa với cùng dung lượng và CRC thì bỏ qua,
+    nên chạy lại sau khi bị ngắt chỉ làm tiếp phần còn thiếu.
+    Trả về dict {format, total, extracted, skipped, seconds}.
+    """
+    from metrics import get_metrics
+
+    fmt = detect_format(path)
+    if fmt is None:
+        raise ArchiveError(f"Không nhận dạng được định dạng archive: {os.path.basename(path)}")
+    os.makedirs(target_dir, exist_ok=True)
+    workers = max(1, workers)
+
+    start = time.perf_counter()
+    extract = _extract_zip if fmt == "zip" else _extract_7z
+    progress = extract(path, target_dir, workers, on_progress, stop_event)
+    seconds = time.perf_counter() - start
+    get_metrics().record("extract", seconds, format=fmt, members=progress.total, skipped=progress.skipped)
+    return {
+        "format": fmt,
+        "total": progress.total,
+        "extracted": progress.done - progress.skipped,
+        "skipped": progress.skipped,
+        "seconds": seconds,
+    }
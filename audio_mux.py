@@ -0,0 +1,65 @@
+import subprocess
+
+# Codec âm thanh có thể copy thẳng vào container MP4 mà không cần encode lại
+MP4_COPY_CODECS = {"aac", "mp3", "ac3", "eac3", "alac"}
+
+AUDIO_MODES = ("auto", "copy", "aac", "none")
+
+
+def source_audio_codec(source_path):
+    """Codec âm thanh của file nguồn, None nếu không có luồng âm thanh"""
+    from media_probe import probe_media
+    return probe_media(source_path).get("audio_codec")
+
+
+def resolve_audio_mode(mode, source_path, audio_codec=False):
+    """
+    Quyết định cách xử lý âm thanh cho một file nguồn:
+    "auto" -> "copy" nếu codec gốc đưa thẳng được vào MP4, ngược lại "aac";
+    nguồn không có âm thanh -> "none". `audio_codec` truyền sẵn (từ chỉ mục nền) để khỏi probe lại.
+    """
+    if mode == "none":
+        return "none"
+    if audio_codec is False:
+        try:
+            audio_codec = source_audio_codec(source_path)
+        except Exception:
+            # Không probe được: encode lại cho chắc
+            return "aac"
+    if not audio_codec:
+        return "none"
+    if mode in ("auto", "copy"):
+        return "copy" if audio_codec.lower() in MP4_COPY_CODECS else "aac"
+    return "aac"
+
+
+def mux_audio(video_path, source_path, out_path, duration, mode, start=0.0, audio_bitrate="128k"):
+    """
+    Ghép luồng âm thanh của file nguồn (cắt từ `start`, dài `duration`) vào video đã render
+    trong một lần chạy ffmpeg, hình được stream copy. Copy lỗi thì tự encode lại AAC.
+    Trả về chế độ âm thanh thực tế đã dùng.
+    """
+    from ffmpeg_render import get_ffmpeg_exe
+
+    def run(audio_args):
+        cmd = [
+            get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-ss", str(start), "-t", str(duration), "-i", source_path,
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "copy", *audio_args,
+            "-t", str(duration), "-movflags", "+faststart",
+            out_path,
+        ]
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if mode == "copy":
+        result = run(["-c:a", "copy"])
+        if result.returncode == 0:
+            return "copy"
+        print(f"Không copy được âm thanh, chuyển sang encode AAC: {result.stderr.decode(errors='replace').strip()[-200:]}")
+
+    result = run(["-c:a", "aac", "-b:a", audio_bitrate])
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg ghép âm thanh lỗi: {result.stderr.decode(errors='replace').strip()[-500:]}")
+    return "aac"
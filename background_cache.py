@@ -0,0 +1,158 @@
+import hashlib
+import os
+import subprocess
+import time
+import uuid
+
+from audio_mux import resolve_audio_mode
+from encode_profiles import EncodeProfile
+from ffmpeg_render import background_filter, get_ffmpeg_exe
+
+# Giới hạn dung lượng cache mặc định (byte)
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+# Độ dài bản chuẩn hóa (giây): đủ để chọn nhiều đoạn 15s khác nhau, rồi seek trong cùng một bản cache
+NORMALIZE_WINDOW = 60
+
+# Khóa chuẩn hóa cũ hơn mức này (giây) coi như của process đã chết giữa chừng
+STALE_LOCK_SECONDS = 30 * 60
+
+# Chỉ dùng cho phần âm thanh của bản trung gian
+CACHE_PROFILE = EncodeProfile("cache", audio_bitrate="192k")
+
+
+class BackgroundCache:
+    """
+    Cache video nền đã chuẩn hóa (cắt `duration` giây đầu, resize + đệm về khung dọc, cố định fps).
+    Khóa gồm đường dẫn, mtime, dung lượng file gốc và thông số khung hình nên file
+    nguồn thay đổi là tự sinh bản mới. Thời điểm dùng gần nhất lưu bằng mtime của
+    file cache, an toàn khi nhiều process render dùng chung thư mục; mỗi nền chỉ một
+    process chuẩn hóa tại một thời điểm (file .lock tạo bằng O_EXCL cạnh bản cache).
+    """
+
+    def __init__(self, cache_dir, size=(720, 1280), fps=30, duration=NORMALIZE_WINDOW, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.fps = fps
+        self.duration = duration
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, source_path):
+        st = os.stat(source_path)
+        raw = "|".join(str(x) for x in (
+            os.path.abspath(source_path), st.st_mtime_ns, st.st_size,
+            self.size[0], self.size[1], self.fps, self.duration,
+        ))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, source_path):
+        return os.path.join(self.cache_dir, f"{self.key(source_path)}.mp4")
+
+    def covers(self, start, duration):
+        """Đoạn [start, start + duration] của nguồn có nằm trong bản chuẩn hóa không"""
+        return start + duration <= self.duration
+
+    def get(self, source_path, audio_codec=False):
+        """
+        Trả về file nền đã chuẩn hóa, tạo mới nếu chưa có trong cache.
+        Trả về None nếu process khác đang chuẩn hóa đúng nền này: người gọi render thẳng từ file gốc
+        thay vì chờ hoặc chuẩn hóa trùng.
+        """
+        cached = self.path_for(source_path)
+        if os.path.exists(cached):
+            # Cập nhật mốc dùng gần nhất cho LRU
+            os.utime(cached, None)
+            return cached
+
+        lock_path = f"{cached}.lock"
+        if not self._acquire(lock_path):
+            return None
+        try:
+            # Process khác có thể vừa chuẩn hóa xong giữa lúc kiểm tra và lúc lấy khóa
+            if not os.path.exists(cached):
+                self._transcode(source_path, cached, audio_codec)
+        finally:
+            os.remove(lock_path)
+        self.evict()
+        return cached
+
+    def _acquire(self, lock_path):
+        """Tạo file khóa bằng O_EXCL; False nếu process khác đang giữ (khóa bỏ dở quá lâu thì chiếm lại)"""
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) < STALE_LOCK_SECONDS:
+                        return False
+                    os.remove(lock_path)
+                except OSError:
+                    # Khóa vừa được nhả hoặc process khác vừa chiếm lại
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def _transcode(self, source_path, cached, audio_codec=False):
+        target_w, target_h = self.size
+        # Ghi ra file tạm rồi đổi tên để process khác không đọc phải file dở
+        tmp_path = f"{cached}.{uuid.uuid4().hex}.tmp.mp4"
+        # Giữ nguyên luồng âm thanh gốc khi được, khỏi giải mã / encode lại
+        audio_mode = resolve_audio_mode("auto", source_path, audio_codec=audio_codec)
+
+        def run(mode):
+            cmd = [
+                get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+                "-i", source_path,
+                "-t", str(self.duration),
+                "-vf", background_filter(target_w, target_h),
+                "-r", str(self.fps),
+                # Bản trung gian chất lượng cao, encode nhanh, keyframe dày để seek rẻ
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "16", "-g", str(self.fps),
+                "-pix_fmt", "yuv420p", *CACHE_PROFILE.audio_args(mode),
+                tmp_path,
+            ]
+            return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        try:
+            result = run(audio_mode)
+            if result.returncode != 0 and audio_mode == "copy":
+                # Luồng âm thanh gốc không đưa được vào MP4: encode lại
+                result = run("aac")
+            if result.returncode != 0:
+                raise RuntimeError(f"Không chuẩn hóa được video nền: {result.stderr.decode(errors='replace').strip()[-500:]}")
+            os.replace(tmp_path, cached)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def entries(self):
+        """Danh sách (đường dẫn, dung lượng, lần dùng gần nhất) của các file cache"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp4") or name.endswith(".tmp.mp4"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append((path, st.st_size, st.st_mtime))
+        return result
+
+    def evict(self):
+        """Xóa các bản ít dùng nhất tới khi tổng dung lượng nằm trong giới hạn"""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # File đang được process khác mở (Windows), bỏ qua lần này
+                pass
@@ -0,0 +1,198 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+# Video nền ngắn hơn mức này bị loại (giây)
+DEFAULT_MIN_DURATION = 8.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backgrounds (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    codec TEXT,
+    rotation INTEGER,
+    audio_codec TEXT,
+    format TEXT,
+    usable INTEGER NOT NULL DEFAULT 0,
+    reason TEXT
+);
+"""
+
+
+class BackgroundIndex:
+    """
+    Chỉ mục thư viện video nền lưu bằng SQLite cạnh thư mục input.
+    Chỉ probe lại file mới hoặc đã đổi (mtime, dung lượng); file hỏng, quá ngắn
+    hoặc quá dọc bị loại trước khi tới bước render. Chọn nền ngẫu nhiên đều,
+    chỉ tránh lặp lại các nền vừa dùng.
+    """
+
+    def __init__(self, input_dir, db_path=None, target_size=(720, 1280), min_duration=DEFAULT_MIN_DURATION,
+                 recent_window=10, refresh_interval=60.0, probe_workers=4):
+        self.input_dir = input_dir
+        self.db_path = db_path or os.path.join(input_dir, ".background_index.sqlite3")
+        self.target_size = tuple(target_size)
+        self.min_duration = min_duration
+        self.recent_window = recent_window
+        self.refresh_interval = refresh_interval
+        self.probe_workers = probe_workers
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._paths = []
+        self._recent = deque(maxlen=max(0, recent_window))
+        self._last_refresh = 0.0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def check_usable(self, info):
+        """Trả về (dùng được?, lý do loại)"""
+        if not info.get("codec") or not info.get("width") or not info.get("height"):
+            return False, "không có luồng video"
+        if info.get("duration", 0) < self.min_duration:
+            return False, f"quá ngắn ({info.get('duration', 0):.1f}s)"
+        w, h = info["width"], info["height"]
+        if info.get("rotation") in (90, 270):
+            w, h = h, w
+        target_w, target_h = self.target_size
+        # Resize theo chiều ngang mà cao hơn khung thì phần trên/dưới bị cắt mất
+        if h / w > target_h / target_w * 1.05:
+            return False, f"quá dọc ({w}x{h})"
+        return True, None
+
+    def _scan(self):
+        found = {}
+        with os.scandir(self.input_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                    st = entry.stat()
+                    found[os.path.abspath(entry.path)] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def _probe(self, path):
+        from media_probe import probe_media
+        from metrics import get_metrics
+        try:
+            with get_metrics().timer("probe"):
+                info = probe_media(path)
+        except Exception as e:
+            return path, None, f"không đọc được: {e}"
+        usable, reason = self.check_usable(info)
+        return path, info, None if usable else reason
+
+    def refresh(self, force=False):
+        """Đồng bộ chỉ mục với thư mục input; trả về số file đã probe lại"""
+        with self._lock:
+            if not force and time.time() - self._last_refresh < self.refresh_interval:
+                return 0
+
+            found = self._scan()
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._conn.execute("SELECT path, mtime_ns, size FROM backgrounds")}
+
+            removed = [p for p in known if p not in found]
+            changed = [p for p, sig in found.items() if known.get(p) != sig]
+
+            if removed:
+                self._conn.executemany("DELETE FROM backgrounds WHERE path = ?", [(p,) for p in removed])
+
+            if changed:
+                with ThreadPoolExecutor(max_workers=self.probe_workers) as pool:
+                    results = list(pool.map(self._probe, changed))
+                rows = []
+                for path, info, reason in results:
+                    info = info or {}
+                    mtime_ns, size = found[path]
+                    rows.append((
+                        path, mtime_ns, size, info.get("duration"), info.get("width"), info.get("height"),
+                        info.get("fps"), info.get("codec"), info.get("rotation"), info.get("audio_codec"),
+                        info.get("format"), 0 if reason else 1, reason,
+                    ))
+                # Giữ nguyên trọng số và lịch sử dùng của file đã có
+                self._conn.executemany(
+                    "INSERT INTO backgrounds (path, mtime_ns, size, duration, width, height, fps, codec, "
+                    "rotation, audio_codec, format, usable, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET mtime_ns=excluded.mtime_ns, size=excluded.size, "
+                    "duration=excluded.duration, width=excluded.width, height=excluded.height, fps=excluded.fps, "
+                    "codec=excluded.codec, rotation=excluded.rotation, audio_codec=excluded.audio_codec, "
+                    "format=excluded.format, usable=excluded.usable, reason=excluded.reason",
+                    rows,
+                )
+                for path, _, reason in results:
+                    if reason:
+                        print(f"Bỏ qua video nền {os.path.basename(path)}: {reason}")
+
+            self._conn.commit()
+            self._load_candidates()
+            self._last_refresh = time.time()
+            return len(changed)
+
+    def _load_candidates(self):
+        self._paths = [row[0] for row in self._conn.execute(
+            "SELECT path FROM backgrounds WHERE usable = 1 ORDER BY path"
+        )]
+
+    def info(self, path):
+        """Metadata đã lưu của một video nền (dict) hoặc None"""
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM backgrounds WHERE path = ?", (os.path.abspath(path),))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cur.description], row))
+
+    def pick(self):
+        """Chọn ngẫu nhiên đều một video nền dùng được, tránh các nền vừa dùng"""
+        with self._lock:
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
+            if not self._paths:
+                return ""
+
+            # Thư viện nhỏ: chỉ tránh lặp trong phạm vi còn lựa chọn
+            avoid = set(list(self._recent)[-max(0, len(self._paths) - 1):]) if len(self._paths) > 1 else set()
+            path = None
+            for _ in range(20):
+                candidate = random.choice(self._paths)
+                if candidate not in avoid:
+                    path = candidate
+                    break
+            if path is None:
+                path = random.choice([p for p in self._paths if p not in avoid] or self._paths)
+
+            self._recent.append(path)
+            return path
+
+    def usable(self):
+        """Danh sách (đường dẫn, thời lượng) các video nền dùng được"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, duration FROM backgrounds WHERE usable = 1 ORDER BY path"
+            ).fetchall()
+
+    def stats(self):
+        with self._lock:
+            total, usable = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(usable), 0) FROM backgrounds"
+            ).fetchone()
+            return {"total": total, "usable": usable, "unusable": total - usable}
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark ghép caption lên frame: CompositeVideoClip của MoviePy (cách cũ),
+trộn float toàn vùng caption, và CaptionCompositor (alpha nhân sẵn, chỉ trộn khung bao chữ).
+
+Chạy từ thư mục gốc dự án:
+    python benchmarks/bench_compositor.py [--frames 300]
+Đo hai loại nền: 16:9 cần letterbox (720x405) và nền đã phủ kín khung (720x1280).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_render_backends import SAMPLE_TEXT  # noqa: E402
+from caption_render import get_renderer  # noqa: E402
+from compositor import CaptionCompositor  # noqa: E402
+from render_engine import get_resource_path  # noqa: E402
+
+CANVAS = (720, 1280)
+
+
+def make_backgrounds(bg_size, count):
+    """Vài frame nền ngẫu nhiên xoay vòng để không đo trúng cache CPU của một frame"""
+    w, h = bg_size
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def bench_moviepy(caption, backgrounds, frames):
+    from moviepy import ColorClip, CompositeVideoClip, ImageClip, VideoClip
+
+    duration = frames / 30
+    video = VideoClip(lambda t: backgrounds[int(t * 30) % len(backgrounds)], duration=duration)
+    # Lớp chữ như cách ghép cũ: ImageClip RGB kèm mask alpha
+    rgba = np.asarray(caption)
+    mask = ImageClip(rgba[:, :, 3] / 255.0, is_mask=True)
+    txt = ImageClip(rgba[:, :, :3]).with_mask(mask).with_duration(duration)
+    final = CompositeVideoClip([
+        ColorClip(size=CANVAS, color=(0, 0, 0), duration=duration),
+        video.with_position(("center", "center")),
+        txt.with_position(("center", "center")),
+    ], size=CANVAS)
+    start = time.perf_counter()
+    for i in range(frames):
+        final.get_frame(i / 30)
+    return time.perf_counter() - start
+
+
+def bench_float(caption, backgrounds, frames):
+    """Trộn float trên cả ảnh caption, cấp phát mảng tạm mỗi frame"""
+    canvas_w, canvas_h = CANVAS
+    rgba = np.asarray(caption)
+    # Caption rộng hơn khung thì cắt phần thừa quanh tâm
+    cw = min(rgba.shape[1], canvas_w)
+    rgba = rgba[:canvas_h, (rgba.shape[1] - cw) // 2:(rgba.shape[1] - cw) // 2 + cw]
+    alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+    rgb = rgba[:, :, :3].astype(np.float32)
+    ch, cw = rgba.shape[:2]
+    y, x = (canvas_h - ch) // 2, (canvas_w - cw) // 2
+    out = np.zeros((canvas_h, canvas_w, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    for i in range(frames):
+        bg = backgrounds[i % len(backgrounds)]
+        out[:] = 0
+        by = (canvas_h - bg.shape[0]) // 2
+        out[by:by + bg.shape[0]] = bg
+        region = out[y:y + ch, x:x + cw]
+        region[...] = region * (1.0 - alpha) + rgb * alpha
+    return time.perf_counter() - start
+
+
+def bench_compositor(caption, backgrounds, frames):
+    compositor = CaptionCompositor(caption, CANVAS)
+    start = time.perf_counter()
+    for i in range(frames):
+        compositor.compose(backgrounds[i % len(backgrounds)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--skip-moviepy", action="store_true", help="Bỏ đo CompositeVideoClip (chậm)")
+    args = parser.parse_args()
+
+    caption_kwargs = {"font_path": get_resource_path("font.ttf"), "font_size": 50,
+                      "stroke_width": 2, "max_width": int(CANVAS[0] * 0.9)}
+    caption = get_renderer().render(SAMPLE_TEXT, **caption_kwargs)
+
+    print(f"{'nền':<10} {'cách ghép':<18} {'ms/frame':>9}")
+    for label, bg_size in (("letterbox", (720, 405)), ("phủ kín", CANVAS)):
+        backgrounds = make_backgrounds(bg_size, 8)
+        rows = []
+        if not args.skip_moviepy:
+            rows.append(("CompositeVideoClip", bench_moviepy(caption, backgrounds, args.frames)))
+        rows.append(("float", bench_float(caption, backgrounds, args.frames)))
+        rows.append(("CaptionCompositor", bench_compositor(caption, backgrounds, args.frames)))
+        for name, seconds in rows:
+            print(f"{label:<10} {name:<18} {seconds / args.frames * 1000:>9.3f}")
+        baseline = rows[0][1]
+        print(f"{label:<10} CaptionCompositor nhanh hơn {rows[0][0]} {baseline / rows[-1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
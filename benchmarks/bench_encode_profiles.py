@@ -0,0 +1,77 @@
+"""
+Ma trận benchmark encode profile: render cùng một video nền tổng hợp + caption với từng profile,
+ghi lại fps, thời gian thực, thời gian CPU và dung lượng file.
+
+Chạy từ thư mục gốc dự án:
+    python benchmarks/bench_encode_profiles.py [--backend ffmpeg] [--profiles fast,balanced] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_render_backends import SAMPLE_TEXT, make_synthetic_background  # noqa: E402
+from encode_profiles import PROFILES  # noqa: E402
+from render_engine import RenderJob, get_resource_path, render_job  # noqa: E402
+
+
+def cpu_seconds():
+    """Thời gian CPU của process hiện tại + các process con đã kết thúc (ffmpeg)"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def run_profile(name, background, out_dir, backend, duration, fps):
+    job = RenderJob(
+        background_path=background, text=SAMPLE_TEXT,
+        output_path=os.path.join(out_dir, f"{name}.mp4"),
+        font_path=get_resource_path("font.ttf"), backend=backend,
+        duration=duration, fps=fps, profile=name,
+    )
+    cpu0, wall0 = cpu_seconds(), time.perf_counter()
+    render_job(job)
+    wall = time.perf_counter() - wall0
+    cpu = cpu_seconds() - cpu0
+    return {
+        "profile": name,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "fps": round(duration * fps / wall, 1),
+        "size_kb": round(os.path.getsize(job.output_path) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("ffmpeg", "moviepy"), default="ffmpeg")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Danh sách profile, cách nhau bởi dấu phẩy")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.profiles.split(",") if n.strip()]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        background = os.path.join(tmp, "background.mp4")
+        make_synthetic_background(background, duration=args.duration, fps=args.fps)
+        for name in names:
+            rows.append(run_profile(name, background, tmp, args.backend, args.duration, args.fps))
+
+    if os.name == "nt":
+        print("Lưu ý: Windows không báo thời gian CPU của process con, cột cpu_s chỉ gồm process Python.")
+    print(f"{'profile':<10} {'wall (s)':>9} {'cpu (s)':>9} {'fps':>7} {'size (KB)':>10}")
+    for r in rows:
+        print(f"{r['profile']:<10} {r['wall_s']:>9.2f} {r['cpu_s']:>9.2f} {r['fps']:>7.1f} {r['size_kb']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+So sánh tốc độ render giữa backend MoviePy, luồng frame (stream) và ffmpeg filter graph trên cùng đầu vào.
+Backend stream báo thêm bộ nhớ đỉnh (process render + các ffmpeg con).
+
+Chạy từ thư mục gốc dự án:
+    python benchmarks/bench_render_backends.py [--background input/x.mp4] [--repeat 3]
+Nếu không chỉ định --background, script tự tạo video nền tổng hợp 1920x1080, 15 giây.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ffmpeg_render import get_ffmpeg_exe  # noqa: E402
+from metrics import Recorder  # noqa: E402
+from render_engine import RenderJob, get_resource_path, render_job  # noqa: E402
+
+SAMPLE_TEXT = (
+    "Hôm nay trời mưa mà quên mang áo,\n"
+    "về tới nhà thì ướt như chuột lột,\n"
+    "đời sao khổ thế này trời ơi"
+)
+
+
+def make_synthetic_background(path, duration=15, size="1920x1080", fps=30):
+    """Tạo video nền có hình động + âm thanh để đo giống dữ liệu thật"""
+    cmd = [
+        get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def bench(backend, background, out_dir, repeat):
+    times, peaks = [], []
+    for i in range(repeat):
+        job = RenderJob(
+            background_path=background, text=SAMPLE_TEXT,
+            output_path=os.path.join(out_dir, f"{backend}_{i}.mp4"),
+            font_path=get_resource_path("font.ttf"), backend=backend,
+        )
+        recorder = Recorder()
+        start = time.perf_counter()
+        render_job(job, recorder)
+        times.append(time.perf_counter() - start)
+        peaks += [value for name, value, _ in recorder.values if name == "render.peak_rss_mb"]
+    return times, peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background", help="Video nền dùng để đo (mặc định: video tổng hợp)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        background = args.background
+        if not background:
+            background = os.path.join(tmp, "background.mp4")
+            make_synthetic_background(background)
+
+        results, memory = {}, {}
+        for backend in ("moviepy", "stream", "ffmpeg"):
+            results[backend], memory[backend] = bench(backend, background, tmp, args.repeat)
+
+    print(f"{'backend':<10} {'min (s)':>9} {'avg (s)':>9} {'RAM đỉnh (MB)':>14}")
+    for backend, times in results.items():
+        peak = f"{max(memory[backend]):.0f}" if memory[backend] else "-"
+        print(f"{backend:<10} {min(times):>9.2f} {sum(times) / len(times):>9.2f} {peak:>14}")
+    speedup = min(results["moviepy"]) / min(results["ffmpeg"])
+    print(f"ffmpeg nhanh hơn {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
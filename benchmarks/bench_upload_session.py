@@ -0,0 +1,46 @@
+"""
+Đo thời gian từng bước của UploadSession trên trang giả lập (không cần mạng, không đăng thật).
+
+Chạy từ thư mục gốc dự án:
+    python benchmarks/bench_upload_session.py [--count 5] [--delay 1500] [--headed]
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_uploader import UploadSession  # noqa: E402
+
+STANDIN = pathlib.Path(__file__).resolve().parent / "upload_standin" / "upload.html"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--delay", type=int, default=1500, help="Thời gian giả lập xử lý video (ms)")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = os.path.join(tmp, "dummy.mp4")
+        with open(video, "wb") as f:
+            f.write(b"\0" * 1024)
+
+        url = f"{STANDIN.as_uri()}?delay={args.delay}"
+        with UploadSession(profile_dir=os.path.join(tmp, "profile"), upload_url=url,
+                           headless=not args.headed, stealth=False) as session:
+            for i in range(args.count):
+                ok = session.upload(video, f"Caption thử nghiệm {i + 1} #test")
+                steps = " ".join(f"{k}={v:.2f}s" for k, v in session.last_timings.items())
+                print(f"#{i + 1} {'OK ' if ok else 'LỖI'} {steps}")
+
+        totals = [sum(t.values()) for t in session.history]
+        print(f"Lần đầu: {totals[0]:.2f}s, trung bình các lần sau: "
+              f"{sum(totals[1:]) / max(1, len(totals) - 1):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
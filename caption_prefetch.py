@@ -0,0 +1,294 @@
+import asyncio
+import random
+import threading
+import time
+
+from metrics import get_metrics
+
+DEFAULT_MODELS = ("gemini-2.0-flash", "gemini-2.5-flash")
+
+# Dấu phân tách khi xin nhiều caption trong một prompt
+BATCH_MARKER = "###"
+
+# Giá trị đặc biệt trong hàng đợi: không còn caption nào nữa
+_CLOSED = object()
+
+
+class CaptionPrefetchError(Exception):
+    pass
+
+
+def clean_caption(text):
+    return text.replace('"', '').strip()
+
+
+def build_batch_prompt(prompt, n):
+    """Gộp yêu cầu n caption vào một prompt để giảm số lần gọi API"""
+    if n <= 1:
+        return prompt
+    return (
+        f"{prompt}\n\n"
+        f"Hãy viết {n} status khác nhau theo yêu cầu trên. "
+        f"Mỗi status bắt đầu bằng một dòng chỉ gồm '{BATCH_MARKER}'."
+    )
+
+
+def split_batch_response(text, n):
+    """Tách tối đa n caption; phần rỗng (kể cả khi n = 1) bị bỏ để request được thử lại / đổi model"""
+    parts = [text] if n <= 1 else text.split(BATCH_MARKER)
+    return [p for p in map(clean_caption, parts) if p][:n]
+
+
+class CaptionPrefetcher:
+    """
+    Sinh caption trước bằng asyncio trên một thread riêng, giữ sẵn một kho caption
+    đi trước bộ render. Mỗi request thử lần lượt các model, mỗi model có timeout
+    riêng và thử lại với backoff lũy thừa.
+    """
+
+    def __init__(self, client, prompt, models=DEFAULT_MODELS, concurrency=2, pool_size=4,
+                 batch_size=1, timeout=30.0, retries=2, backoff=1.0, limit=None):
+        self.client = client
+        self.prompt = prompt
+        self.models = tuple(models)
+        self.concurrency = max(1, concurrency)
+        self.pool_size = max(1, pool_size)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        # Tổng số caption cần sinh; None = sinh tới khi close(). Tăng thêm bằng extend()
+        self._remaining = limit
+        self.stats = {"requests": 0, "retries": 0, "fallbacks": 0, "failures": 0, "captions": 0}
+
+        self._loop = None
+        self._queue = None
+        self._stop = None
+        self._more = None
+        self._waiting = 0
+        self._closed = False
+        self._thread = None
+        # Caption đã sinh nhưng chưa ai lấy lúc close(): (caption, model), để lưu lại vào kho
+        self.leftover = []
+        self._ready = threading.Event()
+
+    # ---------- Phía thread gọi (đồng bộ) ----------
+
+    def start(self):
+        # Đã close(): không dựng lại thread sinh caption (loop cũ đã đóng)
+        if self._closed:
+            return self
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="caption-prefetch", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def get_with_model(self, timeout=None):
+        """Lấy (caption, model đã sinh) từ kho, chặn tới khi có; lỗi sinh caption được ném lại ở đây"""
+        if self._closed:
+            raise CaptionPrefetchError("Bộ sinh caption đã dừng.")
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._next(), self._loop)
+        item = future.result(timeout)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def get(self, timeout=None):
+        return self.get_with_model(timeout)[0]
+
+    def extend(self, n=1):
+        """Xin sinh thêm n caption ngoài `limit` (ví dụ khi caption bị loại vì trùng); bỏ qua nếu đã close()"""
+        if self._closed:
+            return
+        self.start()
+        try:
+            self._loop.call_soon_threadsafe(self._extend, n)
+        except RuntimeError:
+            # close() chen vào giữa chừng và loop đã đóng
+            if not self._closed:
+                raise
+
+    def _extend(self, n):
+        if self._remaining is not None:
+            self._remaining += n
+        self._more.set()
+
+    def close(self):
+        self._closed = True
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- Phía event loop ----------
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        self._queue = asyncio.Queue(maxsize=self.pool_size)
+        self._stop = asyncio.Event()
+        self._more = asyncio.Event()
+        self._ready.set()
+
+        producers = [asyncio.ensure_future(self._producer()) for _ in range(self.concurrency)]
+        await self._stop.wait()
+
+        for p in producers:
+            p.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+        # Giữ lại caption chưa dùng (bỏ lỗi) và báo kết thúc cho mọi consumer còn đang chờ
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not isinstance(item, Exception):
+                self.leftover.append(item)
+        self._queue.put_nowait(_CLOSED)
+        # Để các consumer đang chờ kịp nhận tín hiệu trước khi event loop đóng
+        while self._waiting:
+            await asyncio.sleep(0)
+
+    async def _next(self):
+        self._waiting += 1
+        try:
+            item = await self._queue.get()
+        finally:
+            self._waiting -= 1
+        if item is _CLOSED:
+            # Trả lại để consumer khác cũng nhận được tín hiệu kết thúc
+            self._queue.put_nowait(item)
+            return CaptionPrefetchError("Bộ sinh caption đã dừng.")
+        return item
+
+    def _reserve(self):
+        if self._remaining is None:
+            return self.batch_size
+        n = min(self.batch_size, self._remaining)
+        self._remaining -= n
+        return n
+
+    async def _producer(self):
+        while not self._stop.is_set():
+            n = self._reserve()
+            if n <= 0:
+                # Đã sinh đủ số lượng: chờ extend() hoặc lệnh dừng
+                self._more.clear()
+                await self._more.wait()
+                continue
+            try:
+                captions = await self._fetch(n)
+            except Exception as e:
+                self.stats["failures"] += 1
+                get_metrics().count("gemini.failure")
+                captions = [e] * n
+
+            if self._remaining is not None and len(captions) < n:
+                # Model trả thiếu caption: trả lại phần còn thiếu cho lượt sau
+                self._remaining += n - len(captions)
+            for c in captions:
+                await self._queue.put(c)
+
+    async def _call_model(self, model, contents):
+        aio = getattr(self.client, "aio", None)
+        if aio is not None:
+            call = aio.models.generate_content(model=model, contents=contents)
+        else:
+            call = asyncio.to_thread(self.client.models.generate_content, model=model, contents=contents)
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = await asyncio.wait_for(call, timeout=self.timeout)
+            ok = True
+        finally:
+            get_metrics().record("gemini", time.perf_counter() - start, model=model, ok=ok)
+        return response.text
+
+    async def _fetch(self, n):
+        """Thử các model theo thứ tự ưu tiên, mỗi model thử lại tối đa `retries` lần"""
+        if not self.client:
+            raise CaptionPrefetchError("API Key chưa cấu hình.")
+
+        contents = build_batch_prompt(self.prompt, n)
+        last_error = None
+        for idx, model in enumerate(self.models):
+            if idx > 0:
+                self.stats["fallbacks"] += 1
+                get_metrics().count("gemini.fallback", model=model)
+            for attempt in range(self.retries + 1):
+                if attempt > 0:
+                    self.stats["retries"] += 1
+                    get_metrics().count("gemini.retry", model=model)
+                    await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25))
+                self.stats["requests"] += 1
+                try:
+                    text = await self._call_model(model, contents)
+                    captions = split_batch_response(text or "", n)
+                    if captions:
+                        self.stats["captions"] += len(captions)
+                        return [(c, model) for c in captions]
+                    last_error = CaptionPrefetchError(f"{model} trả về nội dung rỗng.")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    last_error = e
+        raise CaptionPrefetchError(f"Không thể kết nối Gemini API: {last_error}")
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeClient:
+    """
+    Client giả lập giao diện google-genai (cả `models` lẫn `aio.models`) để chạy thử offline.
+    `fail_models` là các model luôn lỗi, dùng để kiểm tra fallback.
+    """
+
+    def __init__(self, latency=0.05, fail_models=()):
+        self.latency = latency
+        self.fail_models = set(fail_models)
+        self.calls = []
+        client = self
+
+        class _AsyncModels:
+            async def generate_content(self, model, contents):
+                await asyncio.sleep(client.latency)
+                return client._respond(model, contents)
+
+        class _Models:
+            def generate_content(self, model, contents):
+                return client._respond(model, contents)
+
+        class _Aio:
+            models = _AsyncModels()
+
+        self.models = _Models()
+        self.aio = _Aio()
+
+    def _respond(self, model, contents):
+        self.calls.append(model)
+        if model in self.fail_models:
+            raise RuntimeError(f"{model} giả lập lỗi")
+        n = 1
+        if BATCH_MARKER in contents:
+            n = int(contents.split("Hãy viết ")[-1].split(" ")[0])
+        if n == 1:
+            return _FakeResponse(f"Caption thử nghiệm {len(self.calls)}")
+        return _FakeResponse("\n".join(
+            f"{BATCH_MARKER}\nCaption thử nghiệm {len(self.calls)}.{i}" for i in range(n)
+        ))
@@ -0,0 +1,98 @@
+import math
+import threading
+from collections import OrderedDict
+
+# Số ảnh caption giữ trong bộ nhớ mỗi process
+DEFAULT_CACHE_SIZE = 64
+
+
+class CaptionRenderer:
+    """
+    Vẽ caption bằng Pillow với font nạp một lần cho mỗi process.
+    Ảnh RGBA kết quả được nhớ theo (text, font, cỡ chữ, viền, bề rộng) trong LRU có giới hạn,
+    nên thử lại / render lại cùng caption không phải dàn trang lần nữa.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._fonts = {}
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_font(self, font_path, font_size):
+        """Nạp font TrueType, mỗi cặp (đường dẫn, cỡ) chỉ đọc file một lần"""
+        from PIL import ImageFont
+
+        key = (font_path, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(font_path, font_size)
+            self._fonts[key] = font
+        return font
+
+    def render(self, text, font_path, font_size=50, stroke_width=2, max_width=0,
+               fill=(255, 255, 255, 255), stroke_fill=(0, 0, 0, 255)):
+        """Trả về ảnh PIL RGBA của caption (dùng chung, không được sửa trực tiếp)"""
+        key = (text, font_path, font_size, stroke_width, max_width, fill, stroke_fill)
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+
+        img = self._draw(text, font_path, font_size, stroke_width, max_width, fill, stroke_fill)
+
+        with self._lock:
+            self._images[key] = img
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return img
+
+    def _draw(self, text, font_path, font_size, stroke_width, max_width, fill, stroke_fill):
+        from PIL import Image, ImageDraw
+
+        font = self.get_font(font_path, font_size)
+        probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        left, top, right, bottom = probe.multiline_textbbox(
+            (0, 0), text, font=font, align="center", stroke_width=stroke_width
+        )
+        # Ảnh rộng bằng khung chữ của MoviePy (90% chiều ngang) để chữ căn giữa giống nhau
+        # Pillow (ví dụ 11.x) trả về toạ độ số thực khi căn giữa nhiều dòng; Image.new cần số nguyên
+        w = max(int(max_width), math.ceil(right - left))
+        h = math.ceil(bottom - top)
+
+        img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.multiline_text(
+            ((w - (right - left)) / 2 - left, -top), text, font=font, fill=fill,
+            align="center", stroke_width=stroke_width, stroke_fill=stroke_fill
+        )
+        return img
+
+    def stats(self):
+        """Thống kê cache: số lần trúng, trượt, tỉ lệ trúng và số ảnh đang giữ"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._images),
+                "fonts": len(self._fonts),
+            }
+
+
+# Mỗi process (kể cả worker của RenderEngine) dùng chung một renderer
+_default_renderer = None
+
+
+def get_renderer():
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = CaptionRenderer()
+    return _default_renderer
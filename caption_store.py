@@ -0,0 +1,195 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Ngưỡng Jaccard trên tập shingle để coi hai caption là gần trùng
+DEFAULT_SIMILARITY = 0.6
+# Số từ trong một shingle
+SHINGLE_SIZE = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_hash TEXT NOT NULL,
+    model TEXT,
+    text TEXT NOT NULL,
+    norm_hash TEXT NOT NULL UNIQUE,
+    shingle_count INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'new',
+    video_path TEXT,
+    created_at REAL NOT NULL,
+    used_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_captions_status ON captions(status, prompt_hash);
+CREATE TABLE IF NOT EXISTS shingles (
+    shingle INTEGER NOT NULL,
+    caption_id INTEGER NOT NULL REFERENCES captions(id) ON DELETE CASCADE,
+    PRIMARY KEY (shingle, caption_id)
+) WITHOUT ROWID;
+"""
+
+
+def prompt_hash(prompt):
+    return hashlib.sha1(prompt.strip().encode("utf-8")).hexdigest()
+
+
+def normalize_text(text):
+    """Chữ thường, chuẩn NFC, bỏ dấu câu/emoji và khoảng trắng thừa (giữ dấu tiếng Việt)"""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def shingles(norm_text, size=SHINGLE_SIZE):
+    """Tập shingle theo từ, băm về số nguyên 63 bit để index gọn"""
+    words = norm_text.split()
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") >> 1
+        for g in grams
+    }
+
+
+class CaptionStore:
+    """
+    Kho caption lưu bằng SQLite: mỗi caption kèm hash prompt, model đã sinh và video đã dùng.
+    Caption trùng hoặc gần trùng (Jaccard shingle) bị từ chối trước khi render.
+    Trạng thái: new (chưa dùng) -> reserved (đang render) -> used (đã vào video).
+    """
+
+    def __init__(self, db_path, similarity=DEFAULT_SIMILARITY):
+        self.db_path = db_path
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def in_dir(cls, output_dir, **kwargs):
+        return cls(os.path.join(output_dir, "captions.sqlite3"), **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def find_similar(self, text):
+        """Trả về id caption trùng / gần trùng nhất, hoặc None"""
+        norm = normalize_text(text)
+        with self._lock:
+            return self._find_similar(norm, shingles(norm))
+
+    def _find_similar(self, norm, sh):
+        norm_hash = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        row = self._conn.execute("SELECT id FROM captions WHERE norm_hash = ?", (norm_hash,)).fetchone()
+        if row:
+            return row[0]
+        if not sh:
+            return None
+
+        # Đếm shingle chung qua bảng index thay vì so từng caption
+        placeholders = ",".join("?" * len(sh))
+        rows = self._conn.execute(
+            f"SELECT s.caption_id, COUNT(*), c.shingle_count FROM shingles s "
+            f"JOIN captions c ON c.id = s.caption_id "
+            f"WHERE s.shingle IN ({placeholders}) GROUP BY s.caption_id",
+            tuple(sh),
+        ).fetchall()
+        best_id, best_score = None, 0.0
+        for caption_id, shared, count in rows:
+            score = shared / (len(sh) + count - shared)
+            if score > best_score:
+                best_id, best_score = caption_id, score
+        return best_id if best_score >= self.similarity else None
+
+    def add(self, text, prompt, model=None, status="new"):
+        """Lưu caption mới; trả về id, hoặc None nếu trùng / gần trùng caption đã có"""
+        norm = normalize_text(text)
+        sh = shingles(norm)
+        with self._lock:
+            if self._find_similar(norm, sh) is not None:
+                return None
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.execute(
+                    "INSERT INTO captions (prompt_hash, model, text, norm_hash, shingle_count, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (prompt_hash(prompt), model, text, hashlib.sha1(norm.encode("utf-8")).hexdigest(),
+                     len(sh), status, time.time()),
+                )
+                caption_id = cur.lastrowid
+                cur.executemany(
+                    "INSERT OR IGNORE INTO shingles (shingle, caption_id) VALUES (?, ?)",
+                    [(s, caption_id) for s in sh],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            return caption_id
+
+    def claim_unused(self, prompt=None):
+        """Lấy một caption chưa dùng (theo prompt nếu có) và đánh dấu reserved; trả về (id, text) hoặc None"""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                if prompt is None:
+                    row = cur.execute(
+                        "SELECT id, text FROM captions WHERE status = 'new' ORDER BY id LIMIT 1"
+                    ).fetchone()
+                else:
+                    row = cur.execute(
+                        "SELECT id, text FROM captions WHERE status = 'new' AND prompt_hash = ? ORDER BY id LIMIT 1",
+                        (prompt_hash(prompt),),
+                    ).fetchone()
+                if row:
+                    cur.execute("UPDATE captions SET status = 'reserved' WHERE id = ?", (row[0],))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            return row
+
+    def claim(self, caption_id):
+        """Giữ chỗ một caption chưa dùng cụ thể; trả về True nếu giữ được"""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE captions SET status = 'reserved' WHERE id = ? AND status = 'new'", (caption_id,)
+            )
+            return cur.rowcount == 1
+
+    def mark_used(self, caption_id, video_path):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE captions SET status = 'used', video_path = ?, used_at = ? WHERE id = ?",
+                (video_path, time.time(), caption_id),
+            )
+
+    def release(self, caption_id):
+        """Trả caption reserved về trạng thái chưa dùng (render lỗi / bị dừng)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE captions SET status = 'new' WHERE id = ? AND status = 'reserved'", (caption_id,)
+            )
+
+    def count_unused(self, prompt=None):
+        with self._lock:
+            if prompt is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM captions WHERE status = 'new'").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM captions WHERE status = 'new' AND prompt_hash = ?",
+                    (prompt_hash(prompt),),
+                ).fetchone()
+            return row[0]
+
@@ -0,0 +1,111 @@
+"""
+Tạo video hàng loạt không cần giao diện (chạy được trên server không có màn hình).
+
+Ví dụ:
+    python cli.py --count 20 --no-upload --render-workers 4
+    python cli.py --count 5 --prompt-file prompt.txt --input-dir D:/nen --output-dir D:/ra
+    python cli.py --count 50 --replay --no-upload
+    python cli.py --resume
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+
+from audio_mux import AUDIO_MODES
+from encode_profiles import PROFILES
+from generator import BatchConfig, VideoGenerator, get_base_dir
+
+
+def build_parser():
+    base_dir = get_base_dir()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1, help="Số video cần tạo")
+    parser.add_argument("--prompt", help="Prompt Gemini (mặc định: prompt của app)")
+    parser.add_argument("--prompt-file", help="Đọc prompt từ file UTF-8")
+    parser.add_argument("--input-dir", default=os.path.join(base_dir, "input"))
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "output"))
+    parser.add_argument("--cache-dir", default=os.path.join(base_dir, "cache", "backgrounds"),
+                        help="Cache video nền đã chuẩn hóa; truyền chuỗi rỗng để tắt")
+    parser.add_argument("--caption-workers", type=int, default=2)
+    parser.add_argument("--caption-batch", type=int, default=1, help="Số caption xin trong một lần gọi Gemini")
+    parser.add_argument("--render-workers", type=int, default=0, help="0 = tự tính theo số nhân CPU")
+    parser.add_argument("--backend", choices=("auto", "ffmpeg", "stream", "moviepy"), default="auto",
+                        help="stream: ffmpeg giải mã sẵn ở khung đích, bộ nhớ cố định cho nền 4K / dài")
+    parser.add_argument("--memory-budget", type=int, default=0,
+                        help="Giới hạn bộ nhớ (MB) mỗi lần render theo luồng frame, 0 = không giới hạn")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default", help="Encode profile")
+    parser.add_argument("--audio", choices=AUDIO_MODES, default="",
+                        help="auto: copy âm thanh gốc nếu được; copy / aac / none (bỏ tiếng). Mặc định theo profile")
+    parser.add_argument("--excerpt", choices=("smart", "start"), default="smart",
+                        help="smart: chọn đoạn nền khác nhau, tránh đoạn đen / đứng hình; start: luôn lấy từ đầu video")
+    parser.add_argument("--output-max-gb", type=float, default=0,
+                        help="Giới hạn dung lượng video đã render trong output-dir (xóa bản ít dùng nhất), 0 = không giới hạn")
+    parser.add_argument("--upload", dest="upload", action="store_true", default=False, help="Đăng TikTok sau khi render")
+    parser.add_argument("--no-upload", dest="upload", action="store_false")
+    parser.add_argument("--replay", action="store_true", help="Chỉ dùng caption đã lưu, không gọi API")
+    parser.add_argument("--resume", action="store_true",
+                        help="Chạy tiếp lô dang dở gần nhất trong output-dir (không render / đăng lại video đã xong)")
+    parser.add_argument("--retries", type=int, default=2, help="Số lần thử lại mỗi công đoạn khi lỗi")
+    return parser
+
+
+def print_status(text, progress=None):
+    if progress is None:
+        print(f"[trạng thái] {text}", flush=True)
+    else:
+        print(f"[{progress:4.0%}] {text}", flush=True)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    prompt = args.prompt
+    if args.prompt_file:
+        with open(args.prompt_file, encoding="utf-8") as f:
+            prompt = f.read().strip()
+
+    api_key = ""
+    if not args.replay:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(os.path.join(get_base_dir(), ".env"))
+        except ImportError:
+            pass
+        api_key = os.getenv("GEMINI_API_KEY", "")
+        if not api_key and not args.resume:
+            print("Lỗi: Thiếu GEMINI_API_KEY (hoặc dùng --replay).", file=sys.stderr)
+            return 2
+
+    config = BatchConfig(
+        input_dir=args.input_dir, output_dir=args.output_dir, cache_dir=args.cache_dir,
+        count=max(1, args.count), upload=args.upload, replay=args.replay, api_key=api_key,
+        caption_workers=args.caption_workers, caption_batch_size=args.caption_batch,
+        render_workers=args.render_workers, render_backend=args.backend, encode_profile=args.profile,
+        audio=args.audio, excerpt=args.excerpt, memory_budget_mb=max(0, args.memory_budget),
+        output_max_gb=max(0.0, args.output_max_gb), stage_retries=max(0, args.retries), resume=args.resume,
+    )
+    if prompt:
+        config.prompt = prompt
+
+    generator = VideoGenerator(config, on_status=print_status)
+    results = []
+    worker = threading.Thread(target=lambda: results.extend(generator.run()), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        # Ctrl+C: xả pipeline như nút Dừng trên giao diện
+        print("Đang dừng, chờ các video đang xử lý dở...", flush=True)
+        generator.stop()
+        worker.join()
+
+    failed = [it for it in results if it.error]
+    return 1 if failed or not results else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
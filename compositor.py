@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class CaptionCompositor:
+    """
+    Ghép caption tĩnh lên nền chuyển động, thay cho CompositeVideoClip trong trường hợp phổ biến
+    "một lớp chữ cố định trên video". Caption được cắt về khung bao phần có chữ và nhân sẵn alpha
+    một lần; mỗi frame chỉ trộn đúng vùng đó bằng phép toán số nguyên NumPy tại chỗ.
+    Nền đã phủ kín khung thì không tô dải đen letterbox.
+    """
+
+    def __init__(self, caption_rgba, canvas_size):
+        self.canvas_w, self.canvas_h = canvas_size
+        caption = np.asarray(caption_rgba)
+        # Gán trước mọi nhánh return sớm (caption rỗng / nằm ngoài khung): compose() vẫn cần buffer đích
+        self.box = None
+        self._out = None
+        self._premul = self._inv_alpha = self._acc = self._tmp = None
+
+        # Vị trí căn giữa của cả ảnh caption trên khung, tính trước khi cắt phần trong suốt
+        top = (self.canvas_h - caption.shape[0]) // 2
+        left = (self.canvas_w - caption.shape[1]) // 2
+
+        alpha = caption[:, :, 3]
+        rows = np.flatnonzero(alpha.any(axis=1))
+        cols = np.flatnonzero(alpha.any(axis=0))
+        if rows.size == 0:
+            # Caption rỗng: không có gì để trộn
+            return
+
+        # Khung bao phần có chữ, cắt thêm phần tràn ra ngoài khung hình
+        r0, r1 = max(rows[0], -top), min(rows[-1] + 1, self.canvas_h - top)
+        c0, c1 = max(cols[0], -left), min(cols[-1] + 1, self.canvas_w - left)
+        if r0 >= r1 or c0 >= c1:
+            return
+        self.box = (top + r0, top + r1, left + c0, left + c1)
+
+        crop = caption[r0:r1, c0:c1]
+        a = crop[:, :, 3:4].astype(np.uint16)
+        # rgb * alpha (tối đa 255*255, vừa uint16) và 255 - alpha, tính một lần cho cả video
+        self._premul = crop[:, :, :3].astype(np.uint16) * a
+        self._inv_alpha = np.broadcast_to(255 - a, self._premul.shape).copy()
+        self._acc = np.empty_like(self._premul)
+        self._tmp = np.empty_like(self._premul)
+
+    def apply(self, frame):
+        """Trộn caption vào frame khung đích (H, W, 3) uint8 ngay tại chỗ, trả về chính frame đó"""
+        if self.box is None:
+            return frame
+        y0, y1, x0, x1 = self.box
+        region = frame[y0:y1, x0:x1]
+        acc, tmp = self._acc, self._tmp
+        # acc = nền * (255 - a) + chữ * a, rồi chia 255 làm tròn đúng: (x + 128 + ((x + 128) >> 8)) >> 8
+        np.multiply(region, self._inv_alpha, out=acc)
+        np.add(acc, self._premul, out=acc)
+        np.add(acc, 128, out=acc)
+        np.right_shift(acc, 8, out=tmp)
+        np.add(acc, tmp, out=acc)
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(region, acc, casting="unsafe")
+        return frame
+
+    def compose(self, background):
+        """
+        Frame nền bất kỳ kích thước -> frame khung đích có caption.
+        Nền đúng bằng khung và ghi được thì trộn thẳng lên nó; nếu không, nền được đặt
+        vào buffer dùng lại giữa các frame, chỉ tô đen các dải letterbox còn trống.
+        """
+        bg_h, bg_w = background.shape[:2]
+        if (bg_w, bg_h) == (self.canvas_w, self.canvas_h) and background.flags.writeable:
+            return self.apply(background)
+
+        if self._out is None:
+            self._out = np.empty((self.canvas_h, self.canvas_w, 3), dtype=np.uint8)
+        out = self._out
+
+        # Căn giữa: phần nền lớn hơn khung bị cắt, phần thiếu để lại dải đen
+        h, w = min(bg_h, self.canvas_h), min(bg_w, self.canvas_w)
+        sy, sx = (bg_h - h) // 2, (bg_w - w) // 2
+        dy, dx = (self.canvas_h - h) // 2, (self.canvas_w - w) // 2
+        out[dy:dy + h, dx:dx + w] = background[sy:sy + h, sx:sx + w, :3]
+        if h < self.canvas_h:
+            out[:dy] = 0
+            out[dy + h:] = 0
+        if w < self.canvas_w:
+            out[dy:dy + h, :dx] = 0
+            out[dy:dy + h, dx + w:] = 0
+        return self.apply(out)
@@ -0,0 +1,84 @@
+from dataclasses import dataclass, replace
+
+# Số thread libx264 mặc định cho mỗi lần encode
+DEFAULT_THREADS = 4
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    """Thiết lập encode libx264 dùng chung cho backend ffmpeg và MoviePy"""
+    name: str
+    preset: str = "medium"
+    crf: int = 23
+    threads: int = DEFAULT_THREADS
+    pix_fmt: str = "yuv420p"
+    # Đưa moov atom lên đầu file để TikTok / trình duyệt phát được ngay khi đang tải
+    faststart: bool = True
+    # "auto": copy luồng âm thanh gốc nếu MP4 chứa được, không thì encode AAC;
+    # "aac": luôn encode lại, "copy": giữ nguyên luồng gốc, "none": bỏ âm thanh
+    audio: str = "auto"
+    audio_bitrate: str = "128k"
+
+    def video_args(self):
+        args = [
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf),
+            "-pix_fmt", self.pix_fmt, "-threads", str(self.threads),
+        ]
+        if self.faststart:
+            args += ["-movflags", "+faststart"]
+        return args
+
+    def audio_args(self, mode=None):
+        """`mode` là chế độ đã quyết định cho từng file nguồn (xem audio_mux.resolve_audio_mode)"""
+        mode = mode or self.audio
+        if mode == "none":
+            return ["-an"]
+        if mode == "copy":
+            return ["-c:a", "copy"]
+        return ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
+    def ffmpeg_args(self, audio_mode=None):
+        """Tham số dòng lệnh ffmpeg cho phần encode"""
+        return self.video_args() + self.audio_args(audio_mode)
+
+    def moviepy_kwargs(self, video_only=False):
+        """
+        Tham số cho write_videofile; MoviePy luôn encode lại âm thanh nên 'copy'/'auto' được coi như 'aac'.
+        `video_only`: chỉ ghi hình, âm thanh được ghép sau bằng audio_mux.mux_audio.
+        """
+        params = ["-crf", str(self.crf), "-pix_fmt", self.pix_fmt]
+        if self.faststart:
+            params += ["-movflags", "+faststart"]
+        kwargs = {
+            "codec": "libx264", "preset": self.preset, "threads": self.threads,
+            "ffmpeg_params": params,
+        }
+        if video_only or self.audio == "none":
+            kwargs["audio"] = False
+        else:
+            kwargs["audio_codec"] = "aac"
+            kwargs["audio_bitrate"] = self.audio_bitrate
+        return kwargs
+
+
+PROFILES = {
+    # Giống cấu hình cũ (preset/CRF mặc định của libx264) nhưng có thread cố định và faststart
+    "default": EncodeProfile("default"),
+    "quality": EncodeProfile("quality", preset="slow", crf=20),
+    "balanced": EncodeProfile("balanced", preset="faster", crf=22),
+    "fast": EncodeProfile("fast", preset="veryfast", crf=23),
+    "draft": EncodeProfile("draft", preset="ultrafast", crf=26),
+    # Video không tiếng, nhanh nhất: bỏ hẳn bước xử lý âm thanh
+    "fast-mute": EncodeProfile("fast-mute", preset="veryfast", crf=23, audio="none"),
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def get_profile(name=None, **overrides):
+    """Lấy profile theo tên, có thể ghi đè từng trường (ví dụ threads=2)"""
+    try:
+        profile = PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"Không có encode profile '{name}'. Có: {', '.join(PROFILES)}")
+    return replace(profile, **overrides) if overrides else profile
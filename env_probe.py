@@ -0,0 +1,131 @@
+import glob
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import time
+
+# Kết quả dò môi trường được tin tối đa trong khoảng này (giây), kể cả khi không có gì thay đổi
+CACHE_TTL = 24 * 3600
+
+
+def app_data_dir():
+    return os.path.join(os.environ.get("APPDATA", ""), "TikTokVideoAI")
+
+
+def default_cache_path():
+    return os.path.join(app_data_dir(), "env_probe.json")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def find_chrome(browser_base_path):
+    """Tìm chrome.exe của Playwright: thử đúng vị trí cài đặt trước, chỉ quét cây thư mục khi cần"""
+    if not os.path.isdir(browser_base_path):
+        return None
+    for pattern in ("chromium-*/chrome-win*/chrome.exe", "chromium-*/chrome-linux*/chrome"):
+        matches = sorted(glob.glob(os.path.join(browser_base_path, pattern)), reverse=True)
+        if matches:
+            return matches[0]
+    for root, _, files in os.walk(browser_base_path):
+        if "chrome.exe" in files:
+            return os.path.join(root, "chrome.exe")
+    return None
+
+
+def find_magick():
+    """Tìm ImageMagick: trong PATH trước, sau đó trong thư mục AppData của app"""
+    path = shutil.which("magick")
+    if path:
+        try:
+            # Trên Windows "magick" có thể trùng tên công cụ khác: chạy thử một lần
+            subprocess.run([path, "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return path
+        except Exception:
+            pass
+
+    local = os.path.join(app_data_dir(), "ImageMagick")
+    for root, _, files in os.walk(local):
+        if "magick.exe" in files:
+            return os.path.join(root, "magick.exe")
+    return None
+
+
+def has_playwright_lib():
+    """Kiểm tra thư viện python mà không import (import playwright tốn thời gian khởi động)"""
+    return all(importlib.util.find_spec(m) is not None for m in ("playwright", "playwright_stealth"))
+
+
+class EnvProbe:
+    """
+    Dò môi trường (Chromium của Playwright, ImageMagick, thư viện playwright) và lưu kết quả ra đĩa.
+    Cache mất hiệu lực khi PATH, mtime các thư mục cài đặt thay đổi, file đã tìm thấy bị xóa
+    hoặc quá CACHE_TTL.
+    """
+
+    def __init__(self, browser_base_path, cache_path=None, ttl=CACHE_TTL):
+        self.browser_base_path = browser_base_path
+        self.cache_path = cache_path or default_cache_path()
+        self.ttl = ttl
+
+    def fingerprint(self):
+        return {
+            "path_env": os.environ.get("PATH", ""),
+            "browser_dir": _mtime(self.browser_base_path),
+            "magick_dir": _mtime(os.path.join(app_data_dir(), "ImageMagick")),
+        }
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass
+
+    def _valid(self, data):
+        if not data or data.get("fingerprint") != self.fingerprint():
+            return False
+        if time.time() - data.get("time", 0) > self.ttl:
+            return False
+        # File đã tìm thấy lần trước phải còn tồn tại
+        return all(p is None or os.path.exists(p) for p in (data.get("chrome"), data.get("magick")))
+
+    def probe(self, force=False):
+        """Trả về dict {chrome, magick, playwright_lib, cached}"""
+        data = None if force else self._load()
+        if self._valid(data):
+            data["cached"] = True
+            return data
+
+        data = {
+            "chrome": find_chrome(self.browser_base_path),
+            "magick": find_magick(),
+            "playwright_lib": has_playwright_lib(),
+            "fingerprint": self.fingerprint(),
+            "time": time.time(),
+        }
+        self._save(data)
+        data["cached"] = False
+        return data
+
+    def invalidate(self):
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
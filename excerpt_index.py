@@ -0,0 +1,287 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import deque
+
+# Phân tích trên bản thu nhỏ, ít frame: đủ để thấy cắt cảnh / đoạn đen / đoạn đứng hình
+ANALYSIS_FPS = 5
+ANALYSIS_WIDTH = 160
+SCENE_THRESHOLD = 0.3
+# Đoạn đen tối thiểu 0.5s; đứng hình (gần như không chuyển động) tối thiểu 2s
+BLACK_MIN_DURATION = 0.5
+STILL_MIN_DURATION = 2.0
+
+# Số điểm bắt đầu vừa dùng của mỗi nền được nhớ để lần sau chọn đoạn khác
+RECENT_STARTS = 5
+# Ưu tiên đoạn bắt đầu ngay tại (hoặc sát sau) một lần cắt cảnh
+CUT_SNAP = 0.5
+# Mức trừ điểm theo tỉ lệ thời lượng đoạn dính nền đen / đứng hình / trùng đoạn vừa dùng
+BLACK_PENALTY = 3.0
+STILL_PENALTY = 1.5
+REPEAT_PENALTY = 0.6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS excerpts (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    ok INTEGER NOT NULL DEFAULT 0,
+    keyframes TEXT NOT NULL DEFAULT '[]',
+    cuts TEXT NOT NULL DEFAULT '[]',
+    black TEXT NOT NULL DEFAULT '[]',
+    still TEXT NOT NULL DEFAULT '[]',
+    recent TEXT NOT NULL DEFAULT '[]',
+    analyzed_at REAL
+);
+"""
+
+_PTS_RE = re.compile(r"pts_time:\s*(-?[\d.]+)")
+_BLACK_RE = re.compile(r"black_start:\s*([\d.]+)\s+black_end:\s*([\d.]+)")
+_FREEZE_START_RE = re.compile(r"freeze_start:\s*([\d.]+)")
+_FREEZE_END_RE = re.compile(r"freeze_end:\s*([\d.]+)")
+
+
+def parse_keyframes(log):
+    """Thời điểm các keyframe từ log showinfo của lượt chỉ giải mã keyframe"""
+    return sorted({round(float(t), 6) for t in _PTS_RE.findall(log) if float(t) >= 0})
+
+
+def parse_analysis(log, duration=None):
+    """(cắt cảnh, đoạn đen, đoạn đứng hình) từ log showinfo / blackdetect / freezedetect"""
+    cuts = sorted({round(float(t), 3) for line in log.splitlines() if "Parsed_showinfo" in line
+                   for t in _PTS_RE.findall(line)})
+    black = [(float(a), float(b)) for a, b in _BLACK_RE.findall(log)]
+    starts = [float(t) for t in _FREEZE_START_RE.findall(log)]
+    ends = [float(t) for t in _FREEZE_END_RE.findall(log)]
+    # Đứng hình tới hết file thì freezedetect không in freeze_end
+    ends += [duration if duration else starts[-1] + STILL_MIN_DURATION] * (len(starts) - len(ends))
+    still = list(zip(starts, ends))
+    return cuts, black, still
+
+
+def overlap(start, end, intervals):
+    return sum(max(0.0, min(end, b) - max(start, a)) for a, b in intervals)
+
+
+class ExcerptIndex:
+    """
+    Chỉ mục điểm cắt cảnh, đoạn đen và đoạn đứng hình của từng video nền, lưu bằng SQLite
+    cạnh thư mục input. Mỗi nền chỉ phân tích một lần (bản thu nhỏ, vài frame/giây), phân tích lại
+    khi file đổi; việc phân tích chạy nền qua prewarm() nên không chặn bước render.
+    Dùng để chọn đoạn 15s khác nhau giữa các video thay vì luôn lấy 15s đầu,
+    tránh intro đen / đứng hình, và bắt đầu đúng keyframe để seek nhanh khi render.
+    """
+
+    def __init__(self, input_dir, db_path=None, recent=RECENT_STARTS):
+        self.input_dir = input_dir
+        self.db_path = db_path or os.path.join(input_dir, ".excerpt_index.sqlite3")
+        self.recent = recent
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        # Điểm bắt đầu vừa dùng của nền chưa phân tích xong (chưa có dòng trong chỉ mục)
+        self._recent = {}
+        self._procs = set()
+        self._stop = threading.Event()
+        self._prewarm = None
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        """Dừng phân tích nền đang chạy (kill ffmpeg) rồi đóng chỉ mục"""
+        self._stop.set()
+        with self._lock:
+            for proc in list(self._procs):
+                if proc.poll() is None:
+                    proc.kill()
+            self._conn.close()
+
+    def prewarm(self, backgrounds, workers=1):
+        """
+        Phân tích trước trên thread nền các video chưa có trong chỉ mục (hoặc đã đổi).
+        `backgrounds`: danh sách (đường dẫn, thời lượng). ffmpeg chạy 1 thread để không giành CPU của render.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._lock:
+            todo = [(os.path.abspath(p), d) for p, d in backgrounds if self._lookup(os.path.abspath(p)) is None]
+        if not todo:
+            return None
+
+        def run():
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                for path, duration in todo:
+                    pool.submit(self._prewarm_one, path, duration)
+
+        self._prewarm = threading.Thread(target=run, name="excerpt-prewarm", daemon=True)
+        self._prewarm.start()
+        return self._prewarm
+
+    def _prewarm_one(self, path, duration):
+        if self._stop.is_set():
+            return
+        try:
+            self.get(path, duration)
+        except Exception as e:
+            if not self._stop.is_set():
+                print(f"Không phân tích được {os.path.basename(path)}: {e}")
+
+    def _lookup(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return self._row(path, st)
+
+    def lookup(self, path):
+        """Kết quả phân tích đã lưu (dict) hoặc None nếu nền chưa phân tích / đã đổi; không chạy ffmpeg"""
+        with self._lock:
+            if self._stop.is_set():
+                return None
+            return self._lookup(os.path.abspath(path))
+
+    def _row(self, path, st):
+        cur = self._conn.execute(
+            "SELECT * FROM excerpts WHERE path = ? AND mtime_ns = ? AND size = ?", (path, st.st_mtime_ns, st.st_size)
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        row = dict(zip([c[0] for c in cur.description], row))
+        for name in ("keyframes", "cuts", "black", "still", "recent"):
+            row[name] = json.loads(row[name])
+        return row
+
+    def get(self, path, duration=None):
+        """Kết quả phân tích của một nền (dict), phân tích nếu chưa có hoặc file đã đổi"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._row(path, st)
+            if row is not None:
+                return row
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        # Mỗi nền chỉ một worker phân tích; worker khác chờ rồi đọc kết quả đã lưu
+        with path_lock:
+            with self._lock:
+                row = self._row(path, st)
+                if row is not None:
+                    return row
+            result = self.analyze(path, duration)
+            with self._lock:
+                if self._stop.is_set():
+                    return None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO excerpts (path, mtime_ns, size, ok, keyframes, cuts, black, still, analyzed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, st.st_mtime_ns, st.st_size, int(result["ok"]), *(json.dumps(result[k]) for k in
+                     ("keyframes", "cuts", "black", "still")), time.time()),
+                )
+                self._conn.commit()
+                return self._row(path, st)
+
+    def analyze(self, path, duration=None):
+        """Hai lượt ffmpeg: chỉ giải mã keyframe, rồi phân tích bản thu nhỏ; lỗi thì trả về ok=False"""
+        from ffmpeg_render import get_ffmpeg_exe
+        from metrics import get_metrics
+
+        result = {"ok": False, "keyframes": [], "cuts": [], "black": [], "still": []}
+        base = [get_ffmpeg_exe(), "-hide_banner", "-nostats", "-threads", "1"]
+        try:
+            with get_metrics().timer("excerpt.analyze"):
+                keys = self._run(
+                    [*base, "-skip_frame", "nokey", "-i", path, "-map", "0:v:0", "-an", "-sn",
+                     "-vf", "showinfo", "-f", "null", "-"]
+                )
+                # close() trong lượt keyframe: không mở lượt giải mã toàn bộ
+                if keys is None:
+                    return result
+                vf = (
+                    f"fps={ANALYSIS_FPS},scale={ANALYSIS_WIDTH}:-2,"
+                    f"blackdetect=d={BLACK_MIN_DURATION}:pix_th=0.10,"
+                    f"freezedetect=n=0.003:d={STILL_MIN_DURATION},"
+                    f"select='gt(scene\\,{SCENE_THRESHOLD})',showinfo"
+                )
+                scan = self._run(
+                    [*base, "-i", path, "-map", "0:v:0", "-an", "-sn", "-vf", vf, "-filter_threads", "1",
+                     "-f", "null", "-"]
+                )
+                if scan is None:
+                    return result
+        except OSError as e:
+            print(f"Không phân tích được {os.path.basename(path)}: {e}")
+            return result
+        if keys.returncode == 0:
+            result["keyframes"] = parse_keyframes(keys.stderr.decode("utf-8", errors="replace"))
+        if scan.returncode == 0:
+            cuts, black, still = parse_analysis(scan.stderr.decode("utf-8", errors="replace"), duration)
+            result.update(ok=True, cuts=cuts, black=black, still=still)
+        return result
+
+    def _run(self, cmd):
+        """Chạy ffmpeg, giữ handle để close() dừng được; trả về CompletedProcess, hoặc None nếu đã close()"""
+        # Kiểm tra _stop và đăng ký process cùng một lần giữ lock: close() không thể lọt vào giữa
+        with self._lock:
+            if self._stop.is_set():
+                return None
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            self._procs.add(proc)
+        try:
+            _, err = proc.communicate()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        return subprocess.CompletedProcess(cmd, proc.returncode, None, err)
+
+    def pick(self, path, window, duration):
+        """
+        Chọn thời điểm bắt đầu đoạn dài `window` giây trong nền dài `duration` giây.
+        Ứng viên là các keyframe (seek không phải giải mã bỏ frame); đoạn dính nền đen / đứng hình
+        bị trừ điểm, bắt đầu sát lần cắt cảnh được cộng điểm, trùng đoạn vừa dùng bị trừ điểm,
+        rồi bốc ngẫu nhiên theo điểm để các video khác nhau.
+        Nền chưa phân tích xong (prewarm còn chạy) thì không chờ: chọn trên lưới mỗi giây,
+        chỉ tránh các đoạn vừa dùng.
+        """
+        from metrics import get_metrics
+
+        max_start = (duration or 0) - window
+        if max_start < 1.0:
+            return 0.0
+        path = os.path.abspath(path)
+        info = self.lookup(path)
+        if info is None:
+            get_metrics().count("excerpt.unanalyzed")
+            info = {"keyframes": [], "cuts": [], "black": [], "still": [], "recent": self._recent.get(path, [])}
+
+        candidates = [t for t in info["keyframes"] if t <= max_start]
+        if len(candidates) < 2:
+            # Không đọc được keyframe: lưới mỗi giây, ffmpeg tự seek về keyframe gần nhất
+            candidates = [float(t) for t in range(int(max_start) + 1)]
+        recent = info["recent"]
+
+        weights = []
+        for start in candidates:
+            end = start + window
+            score = 1.0 - (BLACK_PENALTY * overlap(start, end, info["black"])
+                           + STILL_PENALTY * overlap(start, end, info["still"])) / window
+            if any(0 <= start - cut <= CUT_SNAP for cut in info["cuts"]):
+                score += 0.25
+            if recent:
+                score -= REPEAT_PENALTY * max(max(0.0, window - abs(start - used)) for used in recent) / window
+            weights.append(max(score, 0.01) ** 2)
+        start = random.choices(candidates, weights=weights)[0]
+
+        recent = list(deque(recent + [start], maxlen=self.recent))
+        with self._lock:
+            if "path" not in info:
+                self._recent[path] = recent
+            elif not self._stop.is_set():
+                self._conn.execute("UPDATE excerpts SET recent = ? WHERE path = ?", (json.dumps(recent), path))
+                self._conn.commit()
+        return start
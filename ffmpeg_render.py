@@ -0,0 +1,101 @@
+import os
+import subprocess
+
+from encode_profiles import get_profile
+
+
+def get_ffmpeg_exe():
+    """Đường dẫn ffmpeg đi kèm imageio-ffmpeg (có sẵn trong bản đóng gói)"""
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def rasterise_caption(text, font_path, font_size, max_width, out_path, stroke_width=2):
+    """Vẽ caption một lần ra PNG nền trong suốt, trả về (rộng, cao) của ảnh"""
+    from caption_render import get_renderer
+
+    img = get_renderer().render(
+        text, font_path, font_size=font_size, stroke_width=stroke_width, max_width=max_width
+    )
+    img.save(out_path)
+    return img.size
+
+
+def background_filter(target_w, target_h):
+    """Resize nền về chiều ngang target_w, cắt phần thừa và đệm đen cho đủ khung dọc"""
+    return (
+        f"scale={target_w}:-2,crop=iw:'min(ih,{target_h})',"
+        f"pad={target_w}:{target_h}:(ow-iw)/2:(oh-ih)/2:black,setsar=1"
+    )
+
+
+def build_filter_graph(target_w, target_h, prenormalized=False):
+    """
+    Filter graph tương đương CompositeVideoClip hiện tại:
+    resize nền về chiều ngang target_w, cắt phần thừa, đệm đen cho đủ khung, chèn chữ ở giữa.
+    Nền lấy từ BackgroundCache đã đúng khung nên chỉ cần overlay.
+    """
+    if prenormalized:
+        return "[0:v][1:v]overlay=(W-w)/2:(H-h)/2:shortest=1[v]"
+    return (
+        f"[0:v]{background_filter(target_w, target_h)}[bg];"
+        f"[bg][1:v]overlay=(W-w)/2:(H-h)/2:shortest=1[v]"
+    )
+
+
+def supports(job):
+    """Kiểm tra job có diễn tả được bằng một filter graph tĩnh hay không"""
+    if job.backend not in ("auto", "ffmpeg"):
+        return False
+    try:
+        import PIL  # noqa: F401
+        import imageio_ffmpeg  # noqa: F401
+    except ImportError:
+        return False
+    return bool(job.text) and os.path.isfile(job.background_path)
+
+
+def render_job_ffmpeg(job, audio_mode=None, recorder=None):
+    """
+    Render bằng một lệnh ffmpeg duy nhất, không đưa từng frame qua Python.
+    `audio_mode` "copy" mà ffmpeg không ghép được luồng gốc thì chạy lại với AAC.
+    """
+    from metrics import Recorder
+
+    recorder = recorder or Recorder()
+    target_w, target_h = job.size
+    caption_png = job.output_path + ".caption.png"
+    try:
+        with recorder.timer("render.caption"):
+            _, caption_h = rasterise_caption(
+                job.text, job.font_path, job.font_size, int(target_w * 0.9), caption_png
+            )
+        if caption_h > target_h:
+            raise ValueError("Caption cao hơn khung hình, không dùng được filter graph.")
+
+        def run(mode):
+            cmd = [
+                get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+                # -ss trước -i: seek thẳng tới keyframe, không giải mã phần nền phía trước
+                "-ss", str(job.start), "-i", job.background_path,
+                "-loop", "1", "-i", caption_png,
+                "-filter_complex", build_filter_graph(target_w, target_h, job.prenormalized),
+                "-map", "[v]", "-map", "0:a?",
+                "-t", str(job.duration), "-r", str(job.fps),
+                *get_profile(job.profile).ffmpeg_args(mode),
+                job.output_path,
+            ]
+            return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # Giải mã, ghép chữ và encode nằm chung một lệnh ffmpeg
+        with recorder.timer("render.encode", backend="ffmpeg", profile=job.profile):
+            result = run(audio_mode)
+            if result.returncode != 0 and audio_mode == "copy":
+                recorder.count("render.audio_copy_fallback")
+                result = run("aac")
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg lỗi: {result.stderr.decode(errors='replace').strip()[-500:]}")
+        return job.output_path
+    finally:
+        if os.path.exists(caption_png):
+            os.remove(caption_png)
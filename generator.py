@@ -0,0 +1,453 @@
+import os
+import random
+import sys
+import time
+import traceback
+from dataclasses import dataclass
+
+from metrics import get_metrics
+from pipeline import BatchItem, BatchPipeline, NoRetry, Stage
+
+DEFAULT_PROMPT = (
+    "Hãy đóng vai một cô gái ngốc nghếch."
+    "Hãy viết một dòng trạng thái (status) than vãn, kể khổ về chủ đề: ngẫu nhiên. "
+    "Yêu cầu: Giọng văn hay than thân trách phận. "
+    "Sử dụng ngôn ngữ đời thường, độ dài khoảng 40-90 chữ. "
+    "Chỉ trả về nội dung status bằng tiếng Việt, không thêm bất kỳ văn bản dẫn nhập nào khác."
+)
+
+DEFAULT_HASHTAGS = "#tamtrang #cuocsong #trend #tamsu"
+
+
+def get_base_dir():
+    """Thư mục gốc: cạnh file .exe khi đóng gói, cạnh mã nguồn khi chạy python"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def layout_text(item, raw_content):
+    """Dàn caption theo bề rộng glyph thật của font.ttf, gắn text đã xuống dòng và cỡ chữ vào item"""
+    from render_engine import get_resource_path
+    from text_layout import layout_caption
+
+    layout = layout_caption(raw_content, get_resource_path("font.ttf"))
+    item.data["display_text"] = layout.text
+    item.data["font_size"] = layout.font_size
+
+
+def make_gemini_client(api_key):
+    """Tạo client Gemini; google-genai chỉ được import khi thật sự cần gọi API"""
+    if not api_key:
+        return None
+    try:
+        from google import genai
+        return genai.Client(api_key=api_key)
+    except Exception:
+        traceback.print_exc()
+        return None
+
+
+@dataclass
+class BatchConfig:
+    """Toàn bộ thiết lập của một lô video, không phụ thuộc giao diện"""
+    input_dir: str
+    output_dir: str
+    prompt: str = DEFAULT_PROMPT
+    count: int = 1
+    upload: bool = True
+    # Dùng lại caption chưa dùng trong kho, không gọi Gemini
+    replay: bool = False
+    api_key: str = ""
+    # Cache video nền đã chuẩn hóa; rỗng = không dùng
+    cache_dir: str = ""
+    caption_workers: int = 2
+    # 0 = theo số nhân CPU (xem render_engine.default_workers)
+    render_workers: int = 0
+    queue_size: int = 2
+    # Số caption Gemini sinh sẵn đi trước bộ render và số caption xin trong một prompt
+    caption_pool_size: int = 4
+    caption_batch_size: int = 1
+    # Số lần xin caption thay thế khi Gemini trả về status trùng
+    max_duplicate_retries: int = 3
+    # "auto": ffmpeg filter graph, tự quay về render theo luồng frame / MoviePy khi không áp dụng được
+    render_backend: str = "auto"
+    # Ngân sách bộ nhớ (MB) mỗi lần render theo luồng frame; 0 = không giới hạn
+    memory_budget_mb: int = 0
+    # "smart": chọn đoạn nền khác nhau theo chỉ mục cắt cảnh / đoạn đen (excerpt_index); "start": luôn lấy từ giây 0
+    excerpt: str = "smart"
+    # Giới hạn dung lượng (GB) các video đã render trong output_dir, xóa bản ít dùng nhất; 0 = không giới hạn
+    output_max_gb: float = 0
+    # Encode profile (xem encode_profiles.PROFILES)
+    encode_profile: str = "default"
+    # Ghi đè chế độ âm thanh của profile ("auto" / "copy" / "aac" / "none"); rỗng = theo profile
+    audio: str = ""
+    # Khoảng nghỉ an toàn giữa hai lần đăng (giây)
+    cooldown_min: int = 30
+    cooldown_max: int = 60
+    hashtags: str = DEFAULT_HASHTAGS
+    # Số lần thử lại mỗi công đoạn khi lỗi; chờ retry_backoff giây rồi gấp đôi sau mỗi lần
+    stage_retries: int = 2
+    retry_backoff: float = 5.0
+    # Chạy tiếp lô dang dở gần nhất trong output_dir thay vì tạo lô mới
+    resume: bool = False
+
+
+class VideoGenerator:
+    """
+    Pipeline tạo video (caption -> render -> upload) tách khỏi giao diện.
+    Dùng được từ GUI, dòng lệnh hoặc như thư viện; trạng thái báo qua `on_status(text, progress)`.
+    """
+
+    def __init__(self, config, on_status=None, client=None):
+        self.config = config
+        self.on_status = on_status
+        self.client = client
+        self.stop_requested = False
+        self.pipeline = None
+        self.render_engine = None
+        self.prefetcher = None
+        self.caption_store = None
+        self.background_index = None
+        self.excerpt_index = None
+        self.render_cache = None
+        self.upload_session = None
+        self.job_queue = None
+        self.batch_id = None
+        self.uploaded_count = 0
+
+        os.makedirs(config.input_dir, exist_ok=True)
+        os.makedirs(config.output_dir, exist_ok=True)
+
+    def update_status(self, text, progress=None):
+        if self.on_status:
+            self.on_status(text, progress)
+
+    def stop(self):
+        """Ngừng tạo video tiếp theo; việc đang chạy dở được làm nốt"""
+        self.stop_requested = True
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.prefetcher is not None:
+            # Đánh thức worker đang chờ caption và ngừng gọi API thêm
+            self.prefetcher.close()
+
+    def pick_random_video(self):
+        """Chọn một video nền dùng được từ chỉ mục, an toàn khi gọi từ nhiều worker"""
+        return self.background_index.pick()
+
+    def pick_background(self, item):
+        """
+        (video nền, điểm bắt đầu đoạn) của một video. Lựa chọn của lần render trước (cùng lượt
+        hoặc lưu trong hàng đợi job) được dùng lại nếu file nền còn; điểm bắt đầu None = chưa chọn.
+        """
+        video_path = item.data.get("background_path")
+        if video_path and os.path.isfile(video_path):
+            return video_path, item.data.get("excerpt_start")
+        video_path = self.pick_random_video()
+        if not video_path:
+            raise Exception("Không tìm thấy video nền.")
+        item.data["background_path"] = video_path
+        item.data.pop("excerpt_start", None)
+        return video_path, None
+
+    def pick_excerpt(self, video_path, window, duration):
+        """Điểm bắt đầu đoạn nền (giây), không chờ phân tích; lỗi thì quay về giây 0"""
+        try:
+            with get_metrics().timer("excerpt.pick"):
+                return self.excerpt_index.pick(video_path, window, duration)
+        except Exception:
+            traceback.print_exc()
+            return 0.0
+
+    def stage_caption(self, item):
+        """Công đoạn 1: lấy status Gemini đã sinh sẵn (bỏ caption trùng) hoặc caption cũ trong kho"""
+        cfg = self.config
+        if "raw_content" in item.data:
+            # Chạy tiếp lô cũ: caption đã có sẵn trong hàng đợi job
+            return
+        self.update_status(f"{item.label} Đang tạo nội dung...", 0.1)
+        if cfg.replay:
+            row = self.caption_store.claim_unused()
+            if row is None:
+                raise Exception("Kho caption đã hết caption chưa dùng.")
+            caption_id, raw_content = row
+        else:
+            for attempt in range(cfg.max_duplicate_retries + 1):
+                raw_content, model = self.prefetcher.get_with_model()
+                # Lưu là 'new' rồi mới giữ chỗ: caption không vào được video vẫn còn trong kho để replay
+                caption_id = self.caption_store.add(raw_content, cfg.prompt, model)
+                if caption_id is not None and self.caption_store.claim(caption_id):
+                    break
+                if attempt < cfg.max_duplicate_retries:
+                    # Caption trùng với status đã có: xin Gemini thêm một caption thay thế
+                    self.prefetcher.extend(1)
+            else:
+                raise Exception("Gemini liên tục trả về caption trùng.")
+
+        item.data["caption_id"] = caption_id
+        item.data["raw_content"] = raw_content
+        layout_text(item, raw_content)
+        self.job_queue.advance(item.data["job_id"], "captioned", caption_id=caption_id, raw_content=raw_content)
+
+    def stage_render(self, item):
+        """Công đoạn 2: gửi job ghép chữ lên video nền sang process pool render"""
+        from render_engine import RenderJob, get_resource_path
+
+        if "output_path" in item.data:
+            # File đã render ở lần chạy trước, không render lại
+            return
+        video_path, start = self.pick_background(item)
+        info = self.background_index.info(video_path)
+
+        # Tên file đầu ra do RenderCache đặt theo khóa nội dung
+        job = RenderJob(
+            background_path=video_path, text=item.data["display_text"], font_size=item.data["font_size"],
+            output_path="", font_path=get_resource_path("font.ttf"),
+            backend=self.config.render_backend, cache_dir=self.config.cache_dir,
+            profile=self.config.encode_profile, audio=self.config.audio,
+            # Codec âm thanh đã có trong chỉ mục nền: worker khỏi probe lại file gốc
+            audio_codec=info["audio_codec"] if info else False,
+            memory_budget_mb=self.config.memory_budget_mb,
+        )
+        if start is None:
+            start = 0.0
+            if self.config.excerpt == "smart":
+                duration = info["duration"] if info else None
+                if duration and self.config.cache_dir:
+                    # Chỉ chọn đoạn nằm trong bản nền đã chuẩn hóa để mọi video của cùng nền dùng chung cache
+                    from background_cache import NORMALIZE_WINDOW
+                    duration = min(duration, max(job.duration, NORMALIZE_WINDOW))
+                start = self.pick_excerpt(video_path, job.duration, duration)
+            # Ghi lại lựa chọn: render thử lại / chạy tiếp lô ra cùng khóa RenderCache, dùng lại file đã render
+            item.data["excerpt_start"] = start
+            self.job_queue.update(item.data["job_id"], background_path=video_path, excerpt_start=start)
+        job.start = start
+        self.update_status(f"{item.label} Đang render video...", 0.4)
+        output_path, cached = self.render_cache.get_or_render(
+            job, lambda j, final_path: self.render_engine.render(j, item.label, name=os.path.basename(final_path))
+        )
+        if cached:
+            get_metrics().count("render.cache_hit")
+            self.update_status(f"{item.label} Dùng lại video đã render: {os.path.basename(output_path)}", 0.7)
+        else:
+            self.render_cache.evict(protect=[output_path, *self.job_queue.pending_outputs()])
+        item.data["output_path"] = output_path
+        self.caption_store.mark_used(item.data["caption_id"], item.data["output_path"])
+        self.job_queue.advance(item.data["job_id"], "rendered", output_path=item.data["output_path"])
+
+    def stage_upload(self, item):
+        """Công đoạn 3: đăng TikTok lần lượt, nghỉ an toàn giữa các lần đăng"""
+        cfg = self.config
+        if not cfg.upload:
+            self.update_status(f"{item.label} Đã render xong.", 1.0)
+            return
+
+        if self.uploaded_count > 0:
+            wait_time = random.randint(cfg.cooldown_min, cfg.cooldown_max)
+            with get_metrics().timer("cooldown", planned=wait_time):
+                for _ in range(wait_time):
+                    if self.stop_requested:
+                        # Chưa đăng: báo là bị bỏ qua (không tính vào số video hoàn tất), job vẫn ở 'rendered'
+                        item.skipped = True
+                        return
+                    self.update_status(f"Nghỉ an toàn {wait_time- _}s...", 0)
+                    time.sleep(1)
+
+        full_description = f"{item.data['raw_content']}\n\n{cfg.hashtags}"
+        self.update_status(f"{item.label} Đang đăng TikTok...", 0.8)
+        # Phiên trình duyệt mở một lần trên thread upload và dùng lại cho cả lô
+        if self.upload_session is None:
+            from tiktok_uploader import UploadSession
+            self.upload_session = UploadSession(on_status=self.update_status)
+        # Ghi mốc trước khi đăng: app tắt giữa chừng thì lần chạy tiếp không đăng lại video này
+        job_id = item.data["job_id"]
+        self.job_queue.advance(job_id, "uploading")
+        success = self.upload_session.upload(item.data["output_path"], full_description)
+        for step, seconds in self.upload_session.last_timings.items():
+            get_metrics().record(f"upload.{step}", seconds, item=item.index)
+        item.data["uploaded"] = success
+        if success:
+            # Chỉ tính lần đăng đã xác nhận: lần đăng lỗi không cần nghỉ an toàn trước lần sau
+            self.uploaded_count += 1
+            self.job_queue.advance(job_id, "uploaded")
+            self.update_status(f"{item.label} Đăng thành công!", 1.0)
+        elif self.upload_session.post_clicked:
+            raise NoRetry("Đã bấm Đăng nhưng không xác nhận được kết quả, kiểm tra thủ công trên TikTok.")
+        else:
+            # Chưa bấm Đăng: an toàn để thử lại
+            self.job_queue.advance(job_id, "rendered")
+            raise Exception("Upload không thành công.")
+
+    def release_captions(self, items):
+        """
+        Trả caption đã giữ chỗ của video lỗi / bị dừng trước khi render về kho (status new),
+        đồng thời gỡ khỏi job để lần chạy tiếp không dùng trùng caption với lượt replay khác.
+        """
+        for item in items:
+            if not (item.error or item.skipped) or "caption_id" not in item.data or "output_path" in item.data:
+                continue
+            self.caption_store.release(item.data["caption_id"])
+            self.job_queue.update(item.data["job_id"], state="pending", caption_id=None, raw_content=None)
+
+    def close_upload_session(self):
+        if self.upload_session is not None:
+            self.upload_session.close()
+            self.upload_session = None
+
+    def prepare_batch(self):
+        """
+        Tạo lô mới trong hàng đợi job, hoặc nạp lô dang dở gần nhất khi `config.resume`.
+        Trả về danh sách BatchItem còn việc phải làm (None nếu không có lô nào để chạy tiếp).
+        """
+        cfg = self.config
+        if cfg.resume:
+            self.batch_id = self.job_queue.latest_unfinished()
+            if self.batch_id is None:
+                return None
+            batch = self.job_queue.batch(self.batch_id)
+            saved = batch["config"]
+            cfg.prompt = saved.get("prompt", cfg.prompt)
+            cfg.replay = saved.get("replay", cfg.replay)
+            cfg.hashtags = saved.get("hashtags", cfg.hashtags)
+            cfg.upload = bool(batch["upload"])
+            total = batch["count"]
+            rows = self.job_queue.resumable(self.batch_id)
+        else:
+            saved = {"prompt": cfg.prompt, "hashtags": cfg.hashtags, "replay": cfg.replay}
+            self.batch_id = self.job_queue.create_batch(cfg.count, cfg.upload, saved)
+            total = cfg.count
+            rows = self.job_queue.jobs(self.batch_id)
+
+        items = []
+        for row in rows:
+            item = BatchItem(row["idx"], total)
+            item.data["job_id"] = row["id"]
+            if row["state"] != "pending" and row["raw_content"] is not None:
+                item.data["caption_id"] = row["caption_id"]
+                item.data["raw_content"] = row["raw_content"]
+                layout_text(item, row["raw_content"])
+            if row["state"] == "rendered":
+                item.data["output_path"] = row["output_path"]
+            if row["background_path"]:
+                item.data["background_path"] = row["background_path"]
+                if row["excerpt_start"] is not None:
+                    item.data["excerpt_start"] = row["excerpt_start"]
+            items.append(item)
+        return items
+
+    def run(self):
+        """Chạy cả lô, chặn tới khi xong hoặc bị dừng; trả về danh sách BatchItem"""
+        from caption_prefetch import CaptionPrefetcher
+        from background_index import BackgroundIndex
+        from excerpt_index import ExcerptIndex
+        from caption_store import CaptionStore
+        from job_queue import JobQueue
+        from render_cache import RenderCache
+        from render_engine import RenderEngine
+
+        cfg = self.config
+        self.uploaded_count = 0
+
+        metrics = get_metrics()
+
+        def on_error(stage_name, item, error):
+            metrics.event("error", stage=stage_name, item=item.index, error=repr(error))
+            self.job_queue.mark_failed(item.data["job_id"], f"{stage_name}: {error}")
+            self.update_status(f"{item.label} Lỗi ở bước {stage_name}: {error}", 0)
+
+        def on_retry(stage_name, item, error, attempt, delay):
+            self.job_queue.record_attempt(item.data["job_id"], f"{stage_name}: {error}")
+            if stage_name == "caption" and self.prefetcher is not None:
+                # Lượt caption lỗi đã tính vào giới hạn của bộ sinh: xin thêm một caption cho lần thử lại
+                self.prefetcher.extend(1)
+            self.update_status(f"{item.label} Lỗi ở bước {stage_name}, thử lại lần {attempt} sau {delay:.0f}s...", 0)
+
+        self.job_queue = JobQueue.in_dir(cfg.output_dir)
+        items = self.prepare_batch()
+        if items is None:
+            self.job_queue.close()
+            self.job_queue = None
+            self.update_status("Không có lô nào dang dở để chạy tiếp.", 0)
+            return []
+        if cfg.resume:
+            self.update_status(f"Chạy tiếp lô #{self.batch_id}: còn {len(items)} video.", 0)
+        need_captions = sum(1 for it in items if "raw_content" not in it.data)
+        metrics.open_log(os.path.join(cfg.output_dir, "metrics.jsonl"))
+        metrics.event("batch_start", batch=self.batch_id, videos=len(items), resume=cfg.resume)
+        batch_start = time.perf_counter()
+
+        self.render_engine = RenderEngine(
+            max_workers=cfg.render_workers or None, on_status=self.update_status, profile=cfg.encode_profile
+        )
+        self.caption_store = CaptionStore.in_dir(cfg.output_dir)
+        self.background_index = BackgroundIndex(cfg.input_dir)
+        self.excerpt_index = ExcerptIndex(cfg.input_dir)
+        self.render_cache = RenderCache(cfg.output_dir, max_bytes=int(cfg.output_max_gb * 1024 ** 3))
+        if not cfg.replay and need_captions:
+            if self.client is None:
+                self.client = make_gemini_client(cfg.api_key)
+            self.prefetcher = CaptionPrefetcher(
+                self.client, cfg.prompt, concurrency=cfg.caption_workers,
+                pool_size=cfg.caption_pool_size, batch_size=cfg.caption_batch_size, limit=need_captions
+            ).start()
+        try:
+            # Probe trước thư viện nền (chỉ file mới / đã đổi) để loại file hỏng trước khi render
+            self.background_index.refresh(force=True)
+            if not self.background_index.stats()["usable"] and any("output_path" not in it.data for it in items):
+                self.update_status(
+                    f"Lỗi: Không tìm thấy video nền dùng được trong {cfg.input_dir}; "
+                    f"thêm video rồi chạy tiếp lô #{self.batch_id}.", 0
+                )
+                return []
+            if cfg.excerpt == "smart":
+                # Phân tích cắt cảnh / đoạn đen chạy nền trong lúc chờ caption, không chặn bước render
+                self.excerpt_index.prewarm(self.background_index.usable())
+
+            # Upload luôn chạy 1 worker để đăng tuần tự trên cùng một tài khoản
+            retry = {"retries": cfg.stage_retries, "backoff": cfg.retry_backoff}
+            self.pipeline = BatchPipeline([
+                Stage("caption", self.stage_caption,
+                      workers=cfg.caption_workers, maxsize=cfg.queue_size, **retry),
+                Stage("render", self.stage_render,
+                      workers=self.render_engine.max_workers, maxsize=cfg.queue_size, **retry),
+                Stage("upload", self.stage_upload,
+                      workers=1, maxsize=cfg.queue_size, teardown=self.close_upload_session, **retry),
+            ], on_error=on_error, on_retry=on_retry)
+            if self.stop_requested:
+                self.pipeline.stop()
+            results = self.pipeline.run(items=items)
+
+            self.release_captions(results)
+            done = sum(1 for it in results if not it.error and not it.skipped)
+            cache = self.render_engine.caption_cache_stats()
+            print(f"Cache caption: {cache['hits']} trúng / {cache['misses']} trượt ({cache['hit_rate']:.0%})")
+            metrics.record("batch", time.perf_counter() - batch_start, batch=self.batch_id, videos=len(items), done=done)
+            metrics.event("batch_summary", batch=self.batch_id, stages=metrics.summary(), counters=dict(metrics.counters))
+            print(metrics.format_summary())
+            if not self.job_queue.finish_if_done(self.batch_id):
+                summary = ", ".join(f"{k} {v}" for k, v in self.job_queue.summary(self.batch_id).items())
+                print(f"Lô #{self.batch_id} chưa xong ({summary}); dùng 'Tiếp tục lô' để chạy tiếp.")
+            self.update_status(f"Hoàn tất {done}/{len(items)} video.", 1.0 if done else 0)
+            return results
+        finally:
+            if self.prefetcher is not None:
+                self.prefetcher.close()
+                # Caption sinh dư (sinh sẵn, theo lô) được lưu lại làm caption chưa dùng
+                for text, model in self.prefetcher.leftover:
+                    self.caption_store.add(text, cfg.prompt, model)
+                self.prefetcher = None
+            self.caption_store.close()
+            self.caption_store = None
+            self.background_index.close()
+            self.background_index = None
+            self.excerpt_index.close()
+            self.excerpt_index = None
+            self.render_cache.close()
+            self.render_cache = None
+            self.render_engine.shutdown()
+            self.render_engine = None
+            self.job_queue.close()
+            self.job_queue = None
+            self.pipeline = None
+            metrics.close_log()
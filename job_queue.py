@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Thứ tự các mốc của một video; job chỉ đi tới, không quay lui (trừ khi file render bị xóa)
+STATES = ("pending", "captioned", "rendered", "uploading", "uploaded")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    count INTEGER NOT NULL,
+    upload INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    failed INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    caption_id INTEGER,
+    raw_content TEXT,
+    output_path TEXT,
+    background_path TEXT,
+    excerpt_start REAL,
+    updated_at REAL NOT NULL,
+    UNIQUE (batch_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, state);
+"""
+
+# Cột được phép ghi qua update()
+_JOB_FIELDS = (
+    "state", "failed", "attempts", "error", "caption_id", "raw_content", "output_path",
+    "background_path", "excerpt_start",
+)
+
+# Cột thêm sau này: bổ sung vào file jobs.sqlite3 tạo bởi bản cũ
+_ADDED_COLUMNS = (("background_path", "TEXT"), ("excerpt_start", "REAL"))
+
+
+class JobQueue:
+    """
+    Hàng đợi job bền vững lưu bằng SQLite (WAL) cạnh thư mục output.
+    Mỗi video của lô là một job ghi lại mốc đã qua: pending -> captioned -> rendered
+    -> uploading -> uploaded. Chạy lại sau khi app tắt / crash chỉ làm tiếp phần còn thiếu:
+    không sinh lại caption đã có, không render lại file đã xong, không đăng lại video đã đăng.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in _ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    @classmethod
+    def in_dir(cls, output_dir):
+        return cls(os.path.join(output_dir, "jobs.sqlite3"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _rows(self, sql, params=()):
+        cur = self._conn.execute(sql, params)
+        names = [c[0] for c in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def create_batch(self, count, upload, config=None):
+        """Tạo lô mới với `count` job pending; trả về id lô"""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.execute(
+                    "INSERT INTO batches (count, upload, config, created_at) VALUES (?, ?, ?, ?)",
+                    (count, int(bool(upload)), json.dumps(config or {}, ensure_ascii=False), now),
+                )
+                batch_id = cur.lastrowid
+                cur.executemany(
+                    "INSERT INTO jobs (batch_id, idx, updated_at) VALUES (?, ?, ?)",
+                    [(batch_id, i, now) for i in range(count)],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            return batch_id
+
+    def batch(self, batch_id):
+        """Thông tin lô (dict, `config` đã giải mã) hoặc None"""
+        with self._lock:
+            rows = self._rows("SELECT * FROM batches WHERE id = ?", (batch_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        row["config"] = json.loads(row["config"])
+        return row
+
+    def latest_unfinished(self):
+        """Id lô dang dở gần nhất, hoặc None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM batches WHERE status = 'running' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def jobs(self, batch_id):
+        with self._lock:
+            return self._rows("SELECT * FROM jobs WHERE batch_id = ? ORDER BY idx", (batch_id,))
+
+    def resumable(self, batch_id):
+        """
+        Chuẩn bị chạy tiếp một lô và trả về các job còn việc phải làm.
+        Job đang 'uploading' lúc app dừng có thể đã lên TikTok nên bị đánh dấu lỗi
+        thay vì đăng lại; job 'rendered' mà file đã mất thì quay về 'captioned'.
+        """
+        batch = self.batch(batch_id)
+        if batch is None:
+            return []
+        final = "uploaded" if batch["upload"] else "rendered"
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET failed = 1, error = ?, updated_at = ? "
+                "WHERE batch_id = ? AND state = 'uploading' AND failed = 0",
+                ("Bị ngắt khi đang đăng, có thể đã lên TikTok: kiểm tra thủ công.", now, batch_id),
+            )
+            rows = self._rows("SELECT * FROM jobs WHERE batch_id = ? ORDER BY idx", (batch_id,))
+        pending = []
+        for row in rows:
+            if row["state"] in (final, "uploaded", "uploading"):
+                continue
+            if row["state"] == "rendered" and not (row["output_path"] and os.path.isfile(row["output_path"])):
+                row["state"] = "captioned"
+                row["output_path"] = None
+                self.update(row["id"], state="captioned", output_path=None)
+            pending.append(row)
+        return pending
+
+    def update(self, job_id, **fields):
+        """Ghi các trường của job (state, caption_id, output_path...); mỗi lần gọi là một commit"""
+        unknown = set(fields) - set(_JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Trường job không hợp lệ: {', '.join(sorted(unknown))}")
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def advance(self, job_id, state, **fields):
+        """Chuyển job sang mốc mới và xóa trạng thái lỗi của lần chạy trước"""
+        if state not in STATES:
+            raise ValueError(f"Trạng thái job không hợp lệ: {state}")
+        self.update(job_id, state=state, failed=0, error=None, **fields)
+
+    def record_attempt(self, job_id, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = attempts + 1, error = ?, updated_at = ? WHERE id = ?",
+                (str(error) if error else None, time.time(), job_id),
+            )
+
+    def mark_failed(self, job_id, error):
+        """Job lỗi hẳn ở lần chạy này; mốc đã qua được giữ để lần chạy tiếp bắt đầu lại từ đó"""
+        self.update(job_id, failed=1, error=str(error))
+
+    def pending_outputs(self):
+        """File đã render của các lô chưa xong mà còn chờ đăng (không được xóa khi dọn output)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT j.output_path FROM jobs j JOIN batches b ON b.id = j.batch_id "
+                "WHERE b.status = 'running' AND b.upload = 1 AND j.state IN ('rendered', 'uploading') AND j.output_path IS NOT NULL"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def summary(self, batch_id):
+        """Số job theo trạng thái, cộng số job đang lỗi"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state", (batch_id,)
+            ).fetchall())
+            failed = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND failed = 1", (batch_id,)
+            ).fetchone()[0]
+        counts["failed"] = failed
+        return counts
+
+    def finish_if_done(self, batch_id):
+        """Đóng lô khi mọi job đã tới mốc cuối (hoặc kẹt ở 'uploading' chờ kiểm tra); trả về True nếu đã đóng"""
+        batch = self.batch(batch_id)
+        if batch is None:
+            return False
+        final = ("uploaded", "uploading") if batch["upload"] else ("rendered", "uploading", "uploaded")
+        placeholders = ",".join("?" * len(final))
+        with self._lock:
+            left = self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND state NOT IN ({placeholders})",
+                (batch_id, *final),
+            ).fetchone()[0]
+            if left:
+                return False
+            self._conn.execute(
+                "UPDATE batches SET status = 'done', finished_at = ? WHERE id = ?", (time.time(), batch_id)
+            )
+            return True
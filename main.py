@@ -1,41 +1,25 @@
-import io
-import sys
+import time
+# Mốc sớm nhất để đo thời gian khởi động (xem startup_metrics.py)
+_T0 = time.perf_counter()
+
 import os
-import requests
-import zipfile
 import threading
-import time
-import random
-import json
-import sys
 import subprocess
 import traceback
+import multiprocessing
 import customtkinter as ctk
 from tkinter import filedialog
-from google import genai
 from dotenv import load_dotenv
-
-# Import MoviePy 2.0+
-try:
-    from moviepy import VideoFileClip, TextClip, CompositeVideoClip, ColorClip
-    from moviepy.config import change_settings
-except ImportError:
-    # Sẽ được xử lý trong phần fix_libraries
-    pass
+# Các module nặng (moviepy, google-genai, playwright) chỉ được import khi dùng tới
+from generator import BatchConfig, VideoGenerator, DEFAULT_PROMPT, get_base_dir
+from env_probe import EnvProbe
+from startup_metrics import StartupTimer, measure_requested
+from ui_bus import DEFAULT_FPS, UIBus
 
 # 1. Nạp biến môi trường từ file .env
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Cấu hình Client Gemini
-if GEMINI_API_KEY:
-    try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
-    except:
-        client = None
-else:
-    client = None
-
 # Cấu hình giao diện
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -45,14 +29,13 @@ class VideoAIApp(ctk.CTk):
         super().__init__()
 
         # Xác định thư mục gốc (Base Directory)
-        if getattr(sys, 'frozen', False):
-            self.base_dir = os.path.dirname(sys.executable)
-        else:
-            self.base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.base_dir = get_base_dir()
 
         # Thư mục input luôn nằm cùng cấp với Base Directory
         self.input_dir = os.path.join(self.base_dir, "input")
         self.output_dir = os.path.join(self.base_dir, "output")
+        # Cache video nền đã chuẩn hóa 720x1280
+        self.cache_dir = os.path.join(self.base_dir, "cache", "backgrounds")
 
         # Tự động tạo thư mục nếu chưa có để tránh lỗi
         os.makedirs(self.input_dir, exist_ok=True)
@@ -61,14 +44,16 @@ class VideoAIApp(ctk.CTk):
         # Đặt đường dẫn trình duyệt ngay lập tức
         self.browser_base_path = os.path.join(os.environ.get("LOCALAPPDATA", ""), "ms-playwright")
         os.environ["PLAYWRIGHT_BROWSERS_PATH"] = self.browser_base_path
+        self.env_probe = EnvProbe(self.browser_base_path)
 
         self.title("AI TikTok Video Generator")
         self.geometry("750x750")
 
-        self.video_path = ""
         self.is_processing = False
         self.stop_requested = False
-        self.target_count = 0
+        self.generator = None
+        # Thread worker chỉ gửi cập nhật vào bus; thread Tk vẽ lại theo nhịp cố định
+        self.ui_bus = UIBus()
 
         # Khởi tạo UI trước khi kiểm tra logic
         self.setup_ui()
@@ -80,62 +65,41 @@ class VideoAIApp(ctk.CTk):
 
         # Chạy kiểm tra bất đồng bộ sau khi UI hiển thị
         self.after(500, self.async_check_at_startup)
+        self.after(1000 // DEFAULT_FPS, self.pump_ui)
 
-    def has_playwright_chromium(self):
+    def has_playwright_chromium(self, force=False):
         """Kiểm tra file thực thi chrome.exe"""
-        if not os.path.isdir(self.browser_base_path):
-            return False
-        for root, _, files in os.walk(self.browser_base_path):
-            if "chrome.exe" in files:
-                return True
-        return False
-
-    def check_playwright_lib(self):
-        """Kiểm tra thư viện python"""
-        try:
-            import playwright
-            import playwright_stealth
-            return True
-        except ImportError:
-            return False
+        return bool(self.env_probe.probe(force=force)["chrome"])
 
     def async_check_at_startup(self):
         def task():
-            # 1. Thử tìm ImageMagick tự động
-            has_magick = self.check_imagemagick_installed()
+            # Kết quả dò được cache trên đĩa, chỉ quét lại khi môi trường thay đổi
+            env = self.env_probe.probe()
+
+            # 1. ImageMagick
+            has_magick = self.apply_imagemagick(env["magick"])
 
             # 2. Kiểm tra Browser
-            has_lib = self.check_playwright_lib()
-            has_browser = self.has_playwright_chromium()
+            has_lib = env["playwright_lib"]
+            has_browser = bool(env["chrome"])
 
             if not (has_lib and has_browser and has_magick):
-                self.after(0, lambda: self.show_fix_ui(not has_magick, not has_browser))
+                self.ui_bus.call(self.show_fix_ui, not has_magick, not has_browser)
             else:
-                self.after(0, lambda: self.update_status("Hệ thống đã sẵn sàng"))
+                self.update_status("Hệ thống đã sẵn sàng")
 
         threading.Thread(target=task, daemon=True).start()
 
-    def check_imagemagick_installed(self):
-        """Kiểm tra ImageMagick trong PATH hoặc AppData"""
-        # Kiểm tra trong biến môi trường hệ thống trước
+    def apply_imagemagick(self, path):
+        """Đăng ký ImageMagick tìm được (PATH hoặc AppData) cho MoviePy"""
+        if not path:
+            return False
+        os.environ["IMAGEMAGICK_BINARY"] = path
         try:
-            # Chạy thử lệnh magick -version
-            subprocess.run(["magick", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return True
-        except:
-            pass
-
-        # Kiểm tra trong thư mục cục bộ của App nếu có
-        app_data = os.path.join(os.environ.get("APPDATA", ""), "TikTokVideoAI", "ImageMagick")
-        for root, _, files in os.walk(app_data):
-            if "magick.exe" in files:
-                path = os.path.join(root, "magick.exe")
-                os.environ["IMAGEMAGICK_BINARY"] = path
-                try:
-                    change_settings({"IMAGEMAGICK_BINARY": path})
-                except: pass
-                return True
-        return False
+            from moviepy.config import change_settings
+            change_settings({"IMAGEMAGICK_BINARY": path})
+        except: pass
+        return True
 
     def show_fix_ui(self, missing_magick, missing_browser):
         msg = "⚠️ Hệ thống chưa đủ điều kiện:\n"
@@ -182,13 +146,7 @@ class VideoAIApp(ctk.CTk):
         self.prompt_label = ctk.CTkLabel(self.input_frame, text="Prompt (Tiếng Việt):")
         self.prompt_label.pack(pady=(10, 0), padx=20, anchor="w")
 
-        self.default_prompt = (
-            "Hãy đóng vai một cô gái ngốc nghếch."
-            "Hãy viết một dòng trạng thái (status) than vãn, kể khổ về chủ đề: ngẫu nhiên. "
-            "Yêu cầu: Giọng văn hay than thân trách phận. "
-            "Sử dụng ngôn ngữ đời thường, độ dài khoảng 40-90 chữ. "
-            "Chỉ trả về nội dung status bằng tiếng Việt, không thêm bất kỳ văn bản dẫn nhập nào khác."
-        )
+        self.default_prompt = DEFAULT_PROMPT
 
         self.prompt_entry = ctk.CTkTextbox(self.input_frame, height=100, wrap="word")
         self.prompt_entry.insert("1.0", self.default_prompt)
@@ -210,8 +168,10 @@ class VideoAIApp(ctk.CTk):
         self.upload_checkbox = ctk.CTkCheckBox(self, text="Tự động đăng video lên TikTok", variable=self.upload_var, font=("Segoe UI", 12))
         self.upload_checkbox.pack(pady=5)
 
-        # Chọn ngẫu nhiên video nền
-        self.set_random_video()
+        # Dùng lại caption đã lưu trong kho, không gọi Gemini
+        self.replay_var = ctk.BooleanVar(value=False)
+        self.replay_checkbox = ctk.CTkCheckBox(self, text="Dùng lại caption đã lưu (không gọi API)", variable=self.replay_var, font=("Segoe UI", 12))
+        self.replay_checkbox.pack(pady=5)
 
         # Action Buttons
         btn_frame = ctk.CTkFrame(self)
@@ -224,6 +184,9 @@ class VideoAIApp(ctk.CTk):
         self.btn_stop.grid(row=0, column=1)
         self.btn_stop.configure(state="disabled")
 
+        self.btn_resume = ctk.CTkButton(btn_frame, text="TIẾP TỤC LÔ DỞ", command=lambda: self.start_process(resume=True), height=50, width=140, font=("Segoe UI", 12, "bold"), fg_color="#2980b9", hover_color="#3498db")
+        self.btn_resume.grid(row=0, column=2, padx=(10, 0))
+
         # --- Folder & Manual Upload Frame ---
         secondary_btn_frame = ctk.CTkFrame(self, fg_color="transparent")
         secondary_btn_frame.pack(pady=10)
@@ -244,6 +207,10 @@ class VideoAIApp(ctk.CTk):
         self.status_label = ctk.CTkLabel(self, text="Trạng thái: Đang kiểm tra hệ thống...", text_color="#aaaaaa", wraplength=600)
         self.status_label.pack(pady=5)
 
+        # Mỗi video đang chạy một dòng (caption / render / upload chạy song song)
+        self.jobs_label = ctk.CTkLabel(self, text="", text_color="#888888", font=("Consolas", 11), justify="left")
+        self.jobs_label.pack(pady=0)
+
         self.progress_bar = ctk.CTkProgressBar(self, width=450)
         self.progress_bar.pack(pady=10)
         self.progress_bar.set(0)
@@ -255,9 +222,10 @@ class VideoAIApp(ctk.CTk):
         def run_fix():
             try:
                 # Cài đặt Chromium (Chỉ tải nếu chưa có)
-                if not self.has_playwright_chromium():
+                if not self.has_playwright_chromium(force=True):
                     self.update_status("Đang tải trình duyệt Chromium (~150MB)...")
                     subprocess.check_call(["playwright", "install", "chromium"], shell=True)
+                    self.env_probe.invalidate()
                 else:
                     self.update_status(" Trình duyệt đã có sẵn.")
 
@@ -265,31 +233,58 @@ class VideoAIApp(ctk.CTk):
                 self.update_status(f"Lỗi cài đặt: {str(e)}")
                 traceback.print_exc()
             finally:
-                self.after(0, lambda: self.btn_fix_lib.configure(state="normal", text="CÀI ĐẶT MÔI TRƯỜNG"))
+                self.ui_bus.call(self.btn_fix_lib.configure, state="normal", text="CÀI ĐẶT MÔI TRƯỜNG")
 
         threading.Thread(target=run_fix, daemon=True).start()
 
     def extract_archive(self, file_source, target_dir):
-        """Giải nén tự động cho cả file .zip và .7z"""
-        os.makedirs(target_dir, exist_ok=True)
+        """Giải nén gói nền .zip / .7z thẳng ra đĩa (song song, bỏ qua file đã có); báo tiến độ từng file"""
+        from archive_extract import extract_archive
 
+        tmp_path = None
         if isinstance(file_source, bytes):
-            stream = io.BytesIO(file_source)
-        else:
-            stream = open(file_source, "rb")
+            # Dữ liệu đã nằm trong RAM: ghi ra file tạm để các worker đọc song song
+            tmp_path = os.path.join(target_dir, ".archive.part")
+            os.makedirs(target_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(file_source)
+            file_source = tmp_path
+
+        def on_progress(done, total, name, skipped):
+            action = "Bỏ qua (đã có)" if skipped else "Đã giải nén"
+            self.update_status(f"{action} {done}/{total}: {os.path.basename(name)}", done / total)
 
         try:
-            import py7zr
-            with py7zr.SevenZipFile(stream, mode='r') as z:
-                z.extractall(target_dir)
+            result = extract_archive(file_source, target_dir, on_progress=on_progress)
+            self.update_status(
+                f"Giải nén xong {result['total']} file ({result['skipped']} đã có) trong {result['seconds']:.1f}s.", 1.0
+            )
             return True
-        except Exception as e:
+        except Exception:
             traceback.print_exc()
             return False
         finally:
-            if not isinstance(file_source, bytes): stream.close()
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def update_status(self, text, progress=None):
+        """Gọi được từ mọi thread: chỉ gửi vào bus, pump_ui sẽ vẽ lên widget"""
+        self.ui_bus.post(text, progress)
+
+    def pump_ui(self):
+        """Chạy trên thread Tk: gộp mọi cập nhật dồn lại từ lần vẽ trước thành một lần vẽ"""
+        try:
+            status, jobs_changed = self.ui_bus.drain()
+            if status is not None:
+                self.apply_status(*status)
+            if jobs_changed:
+                self.jobs_label.configure(text="\n".join(self.ui_bus.job_lines()))
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.after(1000 // DEFAULT_FPS, self.pump_ui)
+
+    def apply_status(self, text, progress=None):
         if hasattr(self, 'status_label'):
             self.status_label.configure(text=f"Trạng thái: {text}")
 
@@ -310,121 +305,6 @@ class VideoAIApp(ctk.CTk):
     def open_input_folder(self):
         os.startfile(self.input_dir)
 
-    def set_random_video(self):
-        candidates = [os.path.join(self.input_dir, f) for f in os.listdir(self.input_dir) if f.lower().endswith((".mp4", ".mov", ".avi"))]
-        if candidates:
-            self.video_path = random.choice(candidates)
-
-    def split_text(self, text, max_chars_per_line=22):
-        words = text.split()
-        lines, current_line, current_length = [], [], 0
-        for word in words:
-            if current_length + len(word) + 1 <= max_chars_per_line:
-                current_line.append(word)
-                current_length += len(word) + 1
-            else:
-                lines.append(" ".join(current_line))
-                current_line = [word]
-                current_length = len(word)
-        if current_line: lines.append(" ".join(current_line))
-        return "\n".join(lines)
-
-    def generate_content_with_fallback(self, prompt):
-        if not client: raise Exception("API Key chưa cấu hình.")
-        for model_name in ["gemini-2.0-flash", "gemini-2.5-flash"]:
-            try:
-                response = client.models.generate_content(model=model_name, contents=prompt)
-                return response.text.strip().replace('"', '')
-            except: continue
-        raise Exception("Không thể kết nối Gemini API.")
-
-    def get_pw_profile_dir(self):
-        path = os.path.join(os.environ.get("APPDATA", ""), "TikTokVideoAI", "pw_profile")
-        os.makedirs(path, exist_ok=True)
-        return path
-
-    def upload_to_tiktok_playwright(self, video_path, description):
-        from playwright.sync_api import sync_playwright
-        import playwright_stealth
-        profile_dir = self.get_pw_profile_dir()
-
-        try:
-            with sync_playwright() as p:
-                context = p.chromium.launch_persistent_context(
-                    user_data_dir=profile_dir,
-                    headless=False,
-                    viewport={'width': 1280, 'height': 800},
-                    user_agent=(
-                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/120.0.0.0 Safari/537.36"
-                    ),
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--no-sandbox'
-                    ]
-                )
-
-                page = context.pages[0] if context.pages else context.new_page()
-                page.set_default_timeout(120000)
-
-                try:
-                    playwright_stealth.stealth(page)
-                except Exception as e:
-                    print(f"Stealth warning: {e}")
-
-                self.update_status("Đang truy cập TikTok...")
-                page.goto(
-                    "https://www.tiktok.com/tiktokstudio/upload",
-                    wait_until="domcontentloaded"
-                )
-
-                if "login" in page.url:
-                    self.update_status("Vui lòng đăng nhập TikTok trên trình duyệt để tiếp tục...")
-                    try:
-                        page.wait_for_url("**/tiktokstudio/upload", timeout=600000)
-                    except:
-                        print("Login timeout")
-                        context.close()
-                        return False
-
-                self.update_status("Đang tải video...")
-                file_input = page.locator('input[type="file"]')
-                file_input.wait_for(state="attached", timeout=60000)
-                file_input.set_input_files(video_path)
-
-                self.update_status("Đang nhập mô tả...")
-                caption = page.locator('.notranslate.public-DraftEditor-content')
-                caption.wait_for(state="visible", timeout=60000)
-                caption.click()
-                page.keyboard.press("Control+A")
-                page.keyboard.press("Backspace")
-                page.keyboard.type(description)
-
-                self.update_status("Chờ xử lý video...")
-                post_btn = page.locator('button[data-e2e="post_video_button"]')
-
-                start = time.time()
-                while time.time() - start < 300:
-                    if post_btn.is_visible() and post_btn.is_enabled():
-                        if "Uploading" not in post_btn.inner_text():
-                            break
-                    time.sleep(3)
-
-                post_btn.click()
-                self.update_status("Đã nhấn nút Đăng!")
-
-                time.sleep(15)
-                context.close()
-                return True
-
-        except Exception:
-            print("-" * 30)
-            print("LỖI TIKTOK UPLOAD (PERSISTENT CONTEXT):")
-            traceback.print_exc()
-            print("-" * 30)
-            return False
-
     def start_manual_upload(self):
         """Mở chọn file tại đúng thư mục lưu video và upload"""
         if self.is_processing:
@@ -446,34 +326,35 @@ class VideoAIApp(ctk.CTk):
         self.is_processing = True
 
         def run_upload_task():
-            self.update_browser_ui_visibility()
+            from tiktok_uploader import UploadSession
             try:
                 description = "Khoảnh khắc thú vị! #trending #xuhuong #dailyvlog #cuocsong"
-                success = self.upload_to_tiktok_playwright(selected_file, description)
+                with UploadSession(on_status=self.update_status) as session:
+                    success = session.upload(selected_file, description)
                 if success:
                     self.update_status("Upload thành công!")
                 else:
                     self.update_status("Upload thất bại. Kiểm tra console.")
             finally:
                 self.is_processing = False
-                self.btn_upload_manual.configure(state="normal")
+                self.ui_bus.call(self.btn_upload_manual.configure, state="normal")
 
         threading.Thread(target=run_upload_task, daemon=True).start()
 
     def request_stop(self):
         self.stop_requested = True
+        if self.generator is not None:
+            self.generator.stop()
         self.update_status("Đang dừng...")
         self.btn_stop.configure(state="disabled")
 
-    def start_process(self):
-        if not GEMINI_API_KEY:
+    def start_process(self, resume=False):
+        if not GEMINI_API_KEY and not self.replay_var.get() and not resume:
             self.update_status("Lỗi: Thiếu API KEY.", 0)
             return
 
+        # Video nền được chọn trong generator qua BackgroundIndex (báo lỗi nếu thư mục input trống)
         prompt_text = self.prompt_entry.get("1.0", "end").strip() or self.default_prompt
-        if not self.video_path:
-            self.update_status("Lỗi: Không tìm thấy video nền.", 0)
-            return
 
         try:
             count = int(self.qty_entry.get())
@@ -482,91 +363,54 @@ class VideoAIApp(ctk.CTk):
 
         self.is_processing = True
         self.stop_requested = False
-        self.target_count = count
+        self.ui_bus.clear_jobs()
         self.btn_run.configure(state="disabled", text="ĐANG XỬ LÝ...")
         self.btn_upload_manual.configure(state="disabled")
-        if count > 1: self.btn_stop.configure(state="normal")
+        self.btn_resume.configure(state="disabled")
+        if count > 1 or resume: self.btn_stop.configure(state="normal")
+
+        config = BatchConfig(
+            input_dir=self.input_dir, output_dir=self.output_dir, cache_dir=self.cache_dir,
+            prompt=prompt_text, count=count, upload=self.upload_var.get(),
+            replay=self.replay_var.get(), api_key=GEMINI_API_KEY or "", resume=resume,
+        )
+        self.generator = VideoGenerator(config, on_status=self.update_status)
 
-        thread = threading.Thread(target=self.run_logic, args=(prompt_text, count))
+        thread = threading.Thread(target=self.run_logic, args=(self.generator,))
         thread.daemon = True
         thread.start()
 
-    def run_logic(self, prompt_text, count):
+    def run_logic(self, generator):
         try:
-            for i in range(count):
-                if self.stop_requested: break
-                self.set_random_video()
-                if not self.video_path: break
-
-                self.update_status(f"({i+1}/{count}) Đang tạo nội dung...", 0.1)
-                raw_content = self.generate_content_with_fallback(prompt_text)
-                display_text = self.split_text(raw_content, max_chars_per_line=22)
-
-                self.update_status(f"({i+1}/{count}) Đang render video...", 0.4)
-                clip = VideoFileClip(self.video_path)
-                duration = min(clip.duration, 15)
-                clip = clip.subclipped(0, duration)
-
-                target_w, target_h = 720, 1280
-                background = ColorClip(size=(target_w, target_h), color=(0,0,0), duration=duration)
-                video_resized = clip.resized(width=int(target_w))
-                video_centered = video_resized.with_position(('center', 'center'))
-
-                # Tìm font
-                def get_resource_path(relative_path):
-                    if hasattr(sys, '_MEIPASS'):
-                        return os.path.join(sys._MEIPASS, relative_path)
-                    return os.path.join(os.path.abspath("."), relative_path)
-
-                # Khi dùng font:
-                font_path = get_resource_path("font.ttf")
-
-                txt_clip = TextClip(
-                    text=display_text, font_size=50, color='white', font=font_path,
-                    method='caption', size=(int(target_w * 0.9), None),
-                    stroke_color='black', stroke_width=2, text_align='center'
-                ).with_duration(duration).with_position(('center', 'center'))
-
-                final_video = CompositeVideoClip([background, video_centered, txt_clip], size=(target_w, target_h))
-
-                ts = time.strftime("%Y%m%d%H%M%S")
-                output_name = f"tiktok_{ts}.mp4"
-                output_path = os.path.abspath(os.path.join(self.output_dir, output_name))
-
-                try:
-                    final_video.write_videofile(output_path, fps=30, codec="libx264", audio_codec="aac")
-
-                    if self.upload_var.get():
-                        full_description = f"{raw_content}\n\n#tamtrang #cuocsong #trend #tamsu"
-                        self.update_status(f"({i+1}/{count}) Đang đăng TikTok...", 0.8)
-                        success = self.upload_to_tiktok_playwright(output_path, full_description)
-                        if success:
-                            self.update_status(f"({i+1}/{count}) Đăng thành công!", 1.0)
-                        else:
-                            self.update_status(f"({i+1}/{count}) Upload không thành công.", 0.5)
-                finally:
-                    # Đảm bảo luôn đóng clip dù thành công hay thất bại
-                    if 'final_video' in locals(): final_video.close()
-                    if 'clip' in locals(): clip.close()
-
-                if self.stop_requested: break
-
-                if i < count - 1:
-                    wait_time = random.randint(30, 60)
-                    for _ in range(wait_time):
-                        if self.stop_requested: break
-                        self.update_status(f"Nghỉ an toàn {wait_time- _}s...", 0)
-                        time.sleep(1)
-
+            generator.run()
         except Exception:
             self.update_status("Đã xảy ra lỗi hệ thống.", 0)
             traceback.print_exc()
         finally:
+            self.generator = None
             self.is_processing = False
-            self.btn_run.configure(state="normal", text="TẠO VIDEO TIKTOK", height=50, width=220, font=("Segoe UI", 16, "bold"), fg_color="#fe2c55")
-            self.btn_upload_manual.configure(state="normal", height=40, width=160, font=("Segoe UI", 12, "bold"), fg_color="#27ae60", hover_color="#2ecc71")
-            self.btn_stop.configure(state="disabled", height=50, width=140, font=("Segoe UI", 12, "bold"), fg_color="#6b6b6b")
+            self.ui_bus.call(self.reset_buttons)
+
+    def reset_buttons(self):
+        self.btn_run.configure(state="normal", text="TẠO VIDEO TIKTOK", height=50, width=220, font=("Segoe UI", 16, "bold"), fg_color="#fe2c55")
+        self.btn_upload_manual.configure(state="normal", height=40, width=160, font=("Segoe UI", 12, "bold"), fg_color="#27ae60", hover_color="#2ecc71")
+        self.btn_resume.configure(state="normal")
+        self.btn_stop.configure(state="disabled", height=50, width=140, font=("Segoe UI", 12, "bold"), fg_color="#6b6b6b")
 
 if __name__ == "__main__":
+    # Bắt buộc cho ProcessPoolExecutor khi chạy bản EXE trên Windows
+    multiprocessing.freeze_support()
+    startup = StartupTimer(_T0)
+    startup.mark("imports")
     app = VideoAIApp()
+    startup.mark("ui_built")
+
+    def on_first_frame():
+        app.update_idletasks()
+        startup.mark("first_window")
+        if measure_requested():
+            startup.report(app.base_dir)
+            app.destroy()
+
+    app.after(0, on_first_frame)
     app.mainloop()
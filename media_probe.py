@@ -0,0 +1,89 @@
+import json
+import re
+import shutil
+import subprocess
+
+from ffmpeg_render import get_ffmpeg_exe
+
+
+def _fps(rate):
+    try:
+        num, _, den = str(rate).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _probe_ffprobe(ffprobe, path):
+    cmd = [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip()[-300:] or "ffprobe lỗi")
+    data = json.loads(result.stdout.decode("utf-8", errors="replace"))
+
+    info = {"duration": 0.0, "width": 0, "height": 0, "fps": 0.0, "codec": None,
+            "rotation": 0, "audio_codec": None, "format": data.get("format", {}).get("format_name")}
+    info["duration"] = float(data.get("format", {}).get("duration") or 0)
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and info["codec"] is None:
+            info["codec"] = stream.get("codec_name")
+            info["width"] = int(stream.get("width") or 0)
+            info["height"] = int(stream.get("height") or 0)
+            info["fps"] = _fps(stream.get("avg_frame_rate") or stream.get("r_frame_rate"))
+            rotation = stream.get("tags", {}).get("rotate")
+            for side in stream.get("side_data_list", []):
+                if "rotation" in side:
+                    rotation = side["rotation"]
+            info["rotation"] = int(float(rotation or 0)) % 360
+        elif stream.get("codec_type") == "audio" and info["audio_codec"] is None:
+            info["audio_codec"] = stream.get("codec_name")
+    return info
+
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_RE = re.compile(r"Stream #\S+.*?: Video: (\w+).*?(\d{2,5})x(\d{2,5})")
+_FPS_RE = re.compile(r"([\d.]+) (?:fps|tbr)")
+_AUDIO_RE = re.compile(r"Stream #\S+.*?: Audio: (\w+)")
+_ROTATE_RE = re.compile(r"rotate\s*:\s*(-?\d+)|rotation of (-?[\d.]+) degrees")
+_INPUT_RE = re.compile(r"Input #0, ([\w,]+), from")
+
+
+def _probe_ffmpeg(path):
+    """Dự phòng khi không có ffprobe: đọc thông tin từ log của `ffmpeg -i` (imageio-ffmpeg chỉ kèm ffmpeg)"""
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-i", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    log = result.stderr.decode("utf-8", errors="replace")
+    video = _VIDEO_RE.search(log)
+    if not video:
+        raise RuntimeError("Không đọc được luồng video.")
+
+    info = {"duration": 0.0, "width": int(video.group(2)), "height": int(video.group(3)),
+            "fps": 0.0, "codec": video.group(1), "rotation": 0, "audio_codec": None, "format": None}
+    m = _DURATION_RE.search(log)
+    if m:
+        info["duration"] = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    line = log[video.start():].splitlines()[0]
+    m = _FPS_RE.search(line)
+    if m:
+        info["fps"] = float(m.group(1))
+    m = _ROTATE_RE.search(log)
+    if m:
+        info["rotation"] = int(float(m.group(1) or m.group(2))) % 360
+    m = _AUDIO_RE.search(log)
+    if m:
+        info["audio_codec"] = m.group(1)
+    m = _INPUT_RE.search(log)
+    if m:
+        info["format"] = m.group(1)
+    return info
+
+
+def probe_media(path):
+    """
+    Thông tin cơ bản của file video: duration, width, height, fps, codec, rotation,
+    audio_codec, format. Dùng ffprobe nếu có trong PATH, nếu không thì dùng ffmpeg đi kèm.
+    """
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        return _probe_ffprobe(ffprobe, path)
+    return _probe_ffmpeg(path)
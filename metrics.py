@@ -0,0 +1,217 @@
+"""
+Đo thời gian từng công đoạn của lô video và xuất log JSON-lines.
+
+Mỗi mẫu đo là một dòng trong metrics.jsonl (thư mục output), ví dụ:
+    {"time": 1760000000.1, "event": "timing", "stage": "render.encode", "seconds": 4.21, "backend": "ffmpeg"}
+Bộ đếm (thử lại, fallback, lỗi) ghi với "event": "count"; số đo khác (ví dụ bộ nhớ đỉnh) với "event": "value".
+
+Tóm tắt p50/p95/max theo công đoạn từ file log (so sánh giữa các phiên để bắt regression):
+    python metrics.py output/metrics.jsonl [--last 500]
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Số mẫu gần nhất giữ lại cho mỗi công đoạn khi tính tóm tắt
+DEFAULT_WINDOW = 500
+
+
+def percentile(sorted_values, q):
+    """Percentile theo nearest-rank trên danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples):
+    """{công đoạn: [giây...]} -> {công đoạn: {count, p50, p95, max, total}}"""
+    result = {}
+    for stage, values in sorted(samples.items()):
+        values = sorted(values)
+        result[stage] = {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "max": round(values[-1], 4) if values else 0.0,
+            "total": round(sum(values), 4),
+        }
+    return result
+
+
+def format_summary(summary, counters=None):
+    lines = [f"{'công đoạn':<24} {'n':>5} {'p50 (s)':>9} {'p95 (s)':>9} {'max (s)':>9} {'tổng (s)':>10}"]
+    for stage, s in summary.items():
+        lines.append(f"{stage:<24} {s['count']:>5} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['max']:>9.2f} {s['total']:>10.1f}")
+    if counters:
+        lines.append("Bộ đếm: " + ", ".join(f"{k} {v}" for k, v in sorted(counters.items())))
+    return "\n".join(lines)
+
+
+class Recorder:
+    """
+    Bộ ghi thời gian tối giản, gửi được qua process khác (chỉ chứa list / dict).
+    Dùng trong process render; Metrics ở process chính gộp lại bằng merge().
+    """
+
+    def __init__(self):
+        self.timings = []
+        self.counters = {}
+        self.values = []
+
+    def record(self, stage, seconds, **fields):
+        self.timings.append((stage, seconds, fields))
+
+    def count(self, name, n=1, **fields):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value, **fields):
+        """Số đo không phải thời gian (ví dụ bộ nhớ đỉnh MB)"""
+        self.values.append((name, value, fields))
+
+    def export(self):
+        """Dữ liệu đã ghi, dạng gửi được qua process khác (xem Metrics.merge)"""
+        return {"timings": self.timings, "counters": self.counters, "values": self.values}
+
+    @contextmanager
+    def timer(self, stage, **fields):
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(stage, time.perf_counter() - start, **fields)
+
+
+class Metrics(Recorder):
+    """
+    Bộ đo dùng chung trong process chính, an toàn giữa các thread.
+    Giữ cửa sổ DEFAULT_WINDOW mẫu gần nhất của mỗi công đoạn để tóm tắt p50/p95/max
+    và ghi từng mẫu ra file JSONL nếu đã open_log().
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        super().__init__()
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        # Giá trị lớn nhất của mỗi số đo observe()
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def open_log(self, path):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+            self._log = open(path, "a", encoding="utf-8")
+
+    def close_log(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def _write(self, record):
+        # Gọi khi đang giữ lock
+        if self._log is None:
+            return
+        try:
+            self._log.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self._log.flush()
+        except (OSError, ValueError):
+            pass
+
+    def record(self, stage, seconds, **fields):
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._write({"time": round(time.time(), 3), "event": "timing", "stage": stage,
+                         "seconds": round(seconds, 4), **fields})
+
+    def count(self, name, n=1, **fields):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            self._write({"time": round(time.time(), 3), "event": "count", "name": name, "n": n, **fields})
+
+    def observe(self, name, value, **fields):
+        with self._lock:
+            self.peaks[name] = max(value, self.peaks.get(name, value))
+            self._write({"time": round(time.time(), 3), "event": "value", "name": name, "value": value, **fields})
+
+    def event(self, name, **fields):
+        """Sự kiện không có thời gian (ví dụ lỗi) để bản --windowed không có console vẫn xem lại được"""
+        with self._lock:
+            self._write({"time": round(time.time(), 3), "event": name, **fields})
+
+    def merge(self, exported, **fields):
+        """Gộp kết quả Recorder.export() của một process khác"""
+        for stage, seconds, extra in exported.get("timings", ()):
+            self.record(stage, seconds, **fields, **extra)
+        for name, n in exported.get("counters", {}).items():
+            self.count(name, n, **fields)
+        for name, value, extra in exported.get("values", ()):
+            self.observe(name, value, **fields, **extra)
+
+    def summary(self):
+        with self._lock:
+            return summarize({k: list(v) for k, v in self._samples.items()})
+
+    def format_summary(self):
+        text = format_summary(self.summary(), dict(self.counters))
+        if self.peaks:
+            text += "\nĐỉnh: " + ", ".join(f"{k} {v:g}" for k, v in sorted(self.peaks.items()))
+        return text
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.counters.clear()
+            self.peaks.clear()
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Bộ đo dùng chung cho cả process"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def load_log(path, last=None):
+    """Đọc metrics.jsonl -> ({công đoạn: [giây...]}, {bộ đếm: tổng}); `last`: chỉ lấy n mẫu cuối mỗi công đoạn"""
+    samples = defaultdict(lambda: deque(maxlen=last) if last else [])
+    counters = defaultdict(int)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("event") == "timing":
+                samples[record["stage"]].append(record["seconds"])
+            elif record.get("event") == "count":
+                counters[record["name"]] += record.get("n", 1)
+    return {k: list(v) for k, v in samples.items()}, dict(counters)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="Đường dẫn metrics.jsonl")
+    parser.add_argument("--last", type=int, default=0, help="Chỉ tính n mẫu gần nhất mỗi công đoạn")
+    parser.add_argument("--json", action="store_true", help="In tóm tắt dạng JSON")
+    args = parser.parse_args(argv)
+
+    samples, counters = load_log(args.log, args.last or None)
+    summary = summarize(samples)
+    if args.json:
+        print(json.dumps({"stages": summary, "counters": counters}, ensure_ascii=False, indent=2))
+    else:
+        print(format_summary(summary, counters))
+
+
+if __name__ == "__main__":
+    main()
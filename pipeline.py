@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+import traceback
+
+from metrics import get_metrics
+
+# Đánh dấu kết thúc luồng dữ liệu giữa các công đoạn
+_SENTINEL = object()
+
+
+class NoRetry(Exception):
+    """Lỗi mà thử lại cũng vô ích hoặc không an toàn (ví dụ có thể đã đăng video)"""
+
+
+class _Aborted(Exception):
+    """Pipeline bị dừng khi item đang chờ thử lại"""
+
+
+class Stage:
+    """
+    Một công đoạn trong pipeline: hàm xử lý + số worker + kích thước hàng đợi đầu vào.
+    `teardown` (nếu có) được gọi trên chính thread worker khi worker kết thúc,
+    dùng để đóng tài nguyên gắn với thread như phiên trình duyệt Playwright.
+    Lỗi được thử lại tối đa `retries` lần, chờ `backoff`, 2*`backoff`, 4*`backoff`... giây.
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=2, teardown=None, retries=0, backoff=1.0):
+        self.name = name
+        self.func = func
+        self.teardown = teardown
+        self.workers = max(1, int(workers))
+        self.maxsize = max(1, int(maxsize))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+
+
+class BatchItem:
+    """Một video trong lô: chỉ số, dữ liệu do các công đoạn gắn thêm, lỗi nếu có"""
+
+    def __init__(self, index, total):
+        self.index = index
+        self.total = total
+        self.data = {}
+        self.error = None
+        self.skipped = False
+
+    @property
+    def label(self):
+        return f"({self.index + 1}/{self.total})"
+
+
+class BatchPipeline:
+    """
+    Pipeline nhiều công đoạn nối bằng hàng đợi có giới hạn.
+    Mỗi công đoạn chạy trên các thread riêng nên gọi API, render và upload
+    chồng lấn lên nhau thay vì chạy nối tiếp từng video.
+    """
+
+    # Chu kỳ kiểm tra cờ dừng khi đang chờ hàng đợi (giây)
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, stages, on_error=None, on_retry=None):
+        if not stages:
+            raise ValueError("Pipeline cần ít nhất một công đoạn.")
+        self.stages = stages
+        self.on_error = on_error
+        # on_retry(tên công đoạn, item, lỗi, lần thử, số giây chờ)
+        self.on_retry = on_retry
+        self.stop_event = threading.Event()
+        self._queues = [queue.Queue(maxsize=s.maxsize) for s in stages]
+        self._lock = threading.Lock()
+        self._results = []
+
+    def stop(self):
+        """Ngừng nhận video mới; bước đang chạy được làm nốt, phần còn trong hàng đợi bị bỏ qua"""
+        self.stop_event.set()
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def _put(self, q, item):
+        # Chờ chỗ trống nhưng vẫn phản hồi nút dừng khi hàng đợi đầy
+        while True:
+            try:
+                q.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                if self.stopped and item is not _SENTINEL:
+                    return False
+
+    def _feed(self, items):
+        first = self._queues[0]
+        for item in items:
+            if self.stopped:
+                break
+            if not self._put(first, item):
+                break
+        for _ in range(self.stages[0].workers):
+            self._put(first, _SENTINEL)
+
+    def _finish(self, item):
+        with self._lock:
+            self._results.append(item)
+
+    def _call(self, stage, item):
+        """Chạy công đoạn cho một item, thử lại với backoff lũy thừa khi lỗi"""
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+                get_metrics().record(f"stage.{stage.name}", time.perf_counter() - start, item=item.index)
+                return result
+            except NoRetry:
+                raise
+            except Exception as e:
+                if attempt >= stage.retries or self.stopped:
+                    raise
+                delay = stage.backoff * (2 ** attempt)
+                attempt += 1
+                traceback.print_exc()
+                get_metrics().count(f"retry.{stage.name}")
+                if self.on_retry:
+                    self.on_retry(stage.name, item, e, attempt, delay)
+                if self.stop_event.wait(delay):
+                    raise _Aborted()
+
+    def _worker(self, idx, remaining):
+        stage = self.stages[idx]
+        inbox = self._queues[idx]
+        outbox = self._queues[idx + 1] if idx + 1 < len(self.stages) else None
+
+        while True:
+            item = inbox.get()
+            if item is _SENTINEL:
+                break
+
+            if self.stopped:
+                # Đang xả pipeline: không bắt đầu việc mới
+                item.skipped = True
+                self._finish(item)
+                continue
+
+            try:
+                self._call(stage, item)
+            except _Aborted:
+                # Bị dừng trong lúc chờ thử lại
+                item.skipped = True
+                self._finish(item)
+                continue
+            except Exception as e:
+                item.error = e
+                traceback.print_exc()
+                if self.on_error:
+                    self.on_error(stage.name, item, e)
+                self._finish(item)
+                continue
+
+            if outbox is None:
+                self._finish(item)
+            elif not self._put(outbox, item):
+                item.skipped = True
+                self._finish(item)
+
+        if stage.teardown:
+            try:
+                stage.teardown()
+            except Exception:
+                traceback.print_exc()
+
+        # Worker cuối cùng của công đoạn báo kết thúc cho công đoạn sau
+        with self._lock:
+            remaining[idx] -= 1
+            last = remaining[idx] == 0
+        if last and outbox is not None:
+            for _ in range(self.stages[idx + 1].workers):
+                self._put(outbox, _SENTINEL)
+
+    def run(self, count=0, items=None):
+        """
+        Chạy `count` video mới, hoặc danh sách `items` dựng sẵn (chạy tiếp lô cũ),
+        qua pipeline; chặn tới khi mọi công đoạn kết thúc
+        """
+        if items is None:
+            items = [BatchItem(i, count) for i in range(count)]
+        remaining = [s.workers for s in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(items,), daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._worker, args=(idx, remaining),
+                    name=f"{stage.name}-{w}", daemon=True
+                ))
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        return sorted(self._results, key=lambda it: it.index)
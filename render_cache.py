@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict
+
+# Tăng khi cách render thay đổi (bố cục, compositor...) để bỏ qua các bản render cũ
+KEY_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    background TEXT,
+    text TEXT,
+    settings TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_renders_last_used ON renders(last_used);
+"""
+
+
+def file_identity(path):
+    """Định danh file theo đường dẫn tuyệt đối, mtime và dung lượng (đổi nội dung là đổi khóa)"""
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def render_key(job):
+    """
+    Khóa nội dung của một RenderJob: video nền, caption, font, thông số khung hình và encode.
+    Backend không nằm trong khóa vì các backend cho cùng một hình ảnh.
+    """
+    from encode_profiles import get_profile
+
+    profile = get_profile(job.profile)
+    identity = {
+        "version": KEY_VERSION,
+        "background": file_identity(job.background_path),
+        "text": job.text,
+        "font": file_identity(job.font_path) if job.font_path else None,
+        "font_size": job.font_size,
+        "size": list(job.size),
+        "start": round(job.start, 3),
+        "duration": job.duration,
+        "fps": job.fps,
+        "encode": asdict(profile),
+        "audio": job.audio or profile.audio,
+    }
+    raw = json.dumps(identity, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Video đầu ra đặt tên theo khóa nội dung (tiktok_<hash>.mp4) kèm manifest SQLite trong thư mục output.
+    Cùng nền + caption + thiết lập render thì lấy lại file đã có thay vì render lần nữa,
+    và hai lần render không bao giờ trùng tên file. Giới hạn dung lượng / số file theo LRU.
+    """
+
+    def __init__(self, output_dir, max_bytes=0, max_entries=0):
+        self.output_dir = output_dir
+        # 0 = không giới hạn
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.db_path = os.path.join(output_dir, "render_manifest.sqlite3")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def path_for(self, key):
+        return os.path.abspath(os.path.join(self.output_dir, f"tiktok_{key[:20]}.mp4"))
+
+    def lookup(self, key):
+        """Đường dẫn bản render còn trên đĩa (và cập nhật lần dùng), hoặc None"""
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        row = self._conn.execute("SELECT path, size FROM renders WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path, size = row
+        try:
+            ok = os.path.getsize(path) == size
+        except OSError:
+            ok = False
+        if not ok:
+            # File bị xóa / sửa ngoài app: bỏ khỏi manifest để render lại
+            self._conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+            return None
+        self._conn.execute(
+            "UPDATE renders SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+        )
+        return path
+
+    def get_or_render(self, job, render):
+        """
+        Trả về (đường dẫn, lấy từ cache?). Chưa có thì gọi render(job, final_path) với job.output_path
+        là file tạm (final_path để báo trạng thái / metrics đúng tên), rồi đổi tên thành file theo khóa. Hai worker xin cùng một khóa thì chỉ một worker render.
+        """
+        key = render_key(job)
+        while True:
+            with self._lock:
+                hit = self._lookup(key)
+                if hit:
+                    return hit, True
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            waiting.wait()
+
+        final_path = self.path_for(key)
+        tmp_path = os.path.join(self.output_dir, f".{key[:20]}.{uuid.uuid4().hex[:8]}.tmp.mp4")
+        try:
+            job.output_path = tmp_path
+            render(job, final_path)
+            os.replace(tmp_path, final_path)
+            self._add(key, final_path, job)
+            return final_path, False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _add(self, key, path, job):
+        now = time.time()
+        settings = json.dumps({"size": list(job.size), "start": job.start, "duration": job.duration, "fps": job.fps,
+                               "font_size": job.font_size, "profile": job.profile, "audio": job.audio})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO renders (key, path, size, background, text, settings, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, path, os.path.getsize(path), os.path.abspath(job.background_path), job.text, settings, now, now),
+            )
+
+    def evict(self, protect=()):
+        """
+        Xóa các bản render ít dùng nhất tới khi nằm trong giới hạn dung lượng / số file.
+        `protect`: đường dẫn còn cần (ví dụ video đã render nhưng chưa đăng) thì không xóa.
+        Trả về số file đã xóa.
+        """
+        if not self.max_bytes and not self.max_entries:
+            return 0
+        protect = {os.path.abspath(p) for p in protect if p}
+        with self._lock:
+            rows = self._conn.execute("SELECT key, path, size FROM renders ORDER BY last_used").fetchall()
+            total = sum(r[2] for r in rows)
+            count = len(rows)
+            removed = 0
+            for key, path, size in rows:
+                over_bytes = self.max_bytes and total > self.max_bytes
+                over_count = self.max_entries and count > self.max_entries
+                if not (over_bytes or over_count):
+                    break
+                if os.path.abspath(path) in protect:
+                    continue
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError:
+                    # File đang mở (Windows), để lần sau
+                    continue
+                self._conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+                total -= size
+                count -= 1
+                removed += 1
+            return removed
+
+    def stats(self):
+        with self._lock:
+            count, total, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM renders"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "hits": hits}
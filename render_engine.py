@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from audio_mux import mux_audio, resolve_audio_mode
+from encode_profiles import DEFAULT_PROFILE, get_profile
+from metrics import Recorder, get_metrics
+
+
+def get_resource_path(relative_path):
+    """Đường dẫn tới file đi kèm app (font...), hoạt động cả khi đóng gói PyInstaller"""
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    # Cạnh mã nguồn, không theo thư mục làm việc: cli.py có thể được chạy từ bất kỳ đâu
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path)
+
+
+@dataclass
+class RenderJob:
+    """Thông tin đủ để render một video, gửi được sang process khác"""
+    background_path: str
+    text: str
+    output_path: str
+    font_path: str = ""
+    size: tuple = (720, 1280)
+    # Đoạn nền được dùng: từ giây `start` (nên là một keyframe, xem excerpt_index), dài `duration`
+    start: float = 0.0
+    duration: float = 15
+    fps: int = 30
+    font_size: int = 50
+    # Tên encode profile (xem encode_profiles.PROFILES)
+    profile: str = DEFAULT_PROFILE
+    # Ghi đè chế độ âm thanh của profile: "auto" / "copy" / "aac" / "none"; rỗng = theo profile
+    audio: str = ""
+    # Codec âm thanh của nền lấy từ BackgroundIndex (None = không có tiếng); False = chưa biết, probe lúc render
+    audio_codec: object = False
+    # "auto": thử ffmpeg filter graph trước, lỗi thì render theo luồng frame rồi mới tới MoviePy;
+    # "ffmpeg" / "stream" / "moviepy": ép một backend
+    backend: str = "auto"
+    # Thư mục BackgroundCache; rỗng = không dùng cache nền đã chuẩn hóa
+    cache_dir: str = ""
+    prenormalized: bool = False
+    # Ngân sách bộ nhớ (MB) cho backend "stream", tính cả các process ffmpeg con; 0 = không giới hạn
+    memory_budget_mb: int = 0
+
+
+def render_job(job, recorder=None):
+    """
+    Render một video; chạy được trong process worker, không cần Tk.
+    Thời gian từng bước được ghi vào `recorder` (metrics.Recorder) nếu có.
+    """
+    import ffmpeg_render
+    import stream_render
+
+    recorder = recorder or Recorder()
+
+    if not job.font_path:
+        job.font_path = get_resource_path("font.ttf")
+
+    # Quyết định một lần cho mọi backend: copy luồng âm thanh gốc, encode lại hay bỏ hẳn.
+    # Tính trên file gốc trước khi chuẩn hóa: bản cache giữ nguyên codec copy được hoặc đã là AAC
+    audio_mode = resolve_audio_mode(
+        job.audio or get_profile(job.profile).audio, job.background_path, audio_codec=job.audio_codec
+    )
+
+    if job.cache_dir and not job.prenormalized:
+        from background_cache import NORMALIZE_WINDOW, BackgroundCache
+        try:
+            cache = BackgroundCache(job.cache_dir, size=job.size, fps=job.fps,
+                                    duration=max(job.duration, NORMALIZE_WINDOW))
+            # Một bản chuẩn hóa cho mỗi nền, mọi đoạn trích đều seek bên trong nó (giữ nguyên job.start);
+            # đoạn nằm ngoài bản chuẩn hóa thì render thẳng từ file gốc
+            if cache.covers(job.start, job.duration):
+                with recorder.timer("render.normalize"):
+                    normalized = cache.get(job.background_path, audio_codec=job.audio_codec)
+                if normalized:
+                    job.background_path = normalized
+                    job.prenormalized = True
+                else:
+                    # Worker khác đang chuẩn hóa nền này: render từ file gốc, lần sau dùng bản cache
+                    recorder.count("render.normalize_busy")
+        except Exception:
+            # Không chuẩn hóa được thì render thẳng từ file gốc
+            traceback.print_exc()
+
+    if job.backend == "stream":
+        return stream_render.render_job_stream(job, audio_mode, recorder)
+
+    if ffmpeg_render.supports(job):
+        try:
+            return ffmpeg_render.render_job_ffmpeg(job, audio_mode, recorder)
+        except Exception:
+            if job.backend == "ffmpeg":
+                raise
+            traceback.print_exc()
+
+    # MoviePy giải mã frame gốc (có thể 4K) trong Python: chỉ dùng khi luồng frame không chạy được
+    if job.backend == "auto" and stream_render.supports(job):
+        try:
+            recorder.count("render.fallback_stream")
+            return stream_render.render_job_stream(job, audio_mode, recorder)
+        except stream_render.MemoryBudgetExceeded:
+            raise
+        except Exception:
+            traceback.print_exc()
+    recorder.count("render.fallback_moviepy")
+    return render_job_moviepy(job, audio_mode, recorder)
+
+
+def render_job_moviepy(job, audio_mode="none", recorder=None):
+    """
+    Render bằng MoviePy: ghép từng frame trong Python (đường dự phòng).
+    Chỉ ghi phần hình; âm thanh gốc được ghép lại bằng một lần ffmpeg remux, không giải mã qua Python.
+    """
+    from moviepy import VideoFileClip
+    from caption_render import get_renderer
+    from compositor import CaptionCompositor
+
+    recorder = recorder or Recorder()
+    target_w, target_h = job.size
+    font_path = job.font_path or get_resource_path("font.ttf")
+    video_path = job.output_path if audio_mode == "none" else job.output_path + ".video.mp4"
+
+    with recorder.timer("render.clip_load", backend="moviepy"):
+        clip = VideoFileClip(job.background_path, audio=False)
+    try:
+        start = min(job.start, max(0.0, clip.duration - job.duration))
+        duration = min(clip.duration - start, job.duration)
+        clip = clip.subclipped(start, start + duration)
+        composite_start = time.perf_counter()
+
+        video_resized = clip.resized(width=int(target_w))
+
+        # Caption vẽ sẵn thành ảnh tĩnh (có cache); mỗi frame chỉ trộn vùng có chữ,
+        # không trộn lại nền đen + video + lớp chữ như CompositeVideoClip
+        caption = get_renderer().render(
+            job.text, font_path, font_size=job.font_size, stroke_width=2, max_width=int(target_w * 0.9)
+        )
+        compositor = CaptionCompositor(caption, (target_w, target_h))
+        final_video = video_resized.image_transform(compositor.compose)
+        recorder.record("render.composite", time.perf_counter() - composite_start, backend="moviepy")
+        # MoviePy ghép frame ngay trong lúc encode nên bước này gồm cả thời gian ghép từng frame
+        with recorder.timer("render.encode", backend="moviepy", profile=job.profile):
+            final_video.write_videofile(
+                video_path, fps=job.fps, logger=None, **get_profile(job.profile).moviepy_kwargs(video_only=True)
+            )
+        if audio_mode != "none":
+            with recorder.timer("render.audio_mux", mode=audio_mode):
+                mux_audio(video_path, job.background_path, job.output_path, duration, audio_mode,
+                          start=start, audio_bitrate=get_profile(job.profile).audio_bitrate)
+        return job.output_path
+    finally:
+        # Đảm bảo luôn đóng clip dù thành công hay thất bại
+        if 'final_video' in locals(): final_video.close()
+        clip.close()
+        if video_path != job.output_path and os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def _run_in_worker(job):
+    """Hàm chạy trong process worker: render rồi gửi kèm thống kê cache caption và thời gian từng bước"""
+    from caption_render import get_renderer
+
+    recorder = Recorder()
+    with recorder.timer("render.total", backend=job.backend):
+        output_path = render_job(job, recorder)
+    return output_path, os.getpid(), get_renderer().stats(), recorder.export()
+
+
+def default_workers(profile=None):
+    """Số process render: chia số nhân CPU cho số thread mỗi ffmpeg đã chiếm"""
+    cores = os.cpu_count() or 1
+    return max(1, cores // max(1, get_profile(profile).threads))
+
+
+class RenderEngine:
+    """
+    Bộ render song song bằng ProcessPoolExecutor.
+    Không phụ thuộc giao diện: trạng thái được báo qua callback `on_status(text, progress)`.
+    """
+
+    def __init__(self, max_workers=None, on_status=None, profile=None):
+        self.max_workers = max_workers or default_workers(profile)
+        self.on_status = on_status
+        self._executor = None
+        self._caption_stats = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _report(self, text, progress=None):
+        if self.on_status:
+            try:
+                self.on_status(text, progress)
+            except Exception:
+                traceback.print_exc()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, job, label="", name=""):
+        """
+        Gửi một job sang process pool, trả về Future chứa đường dẫn file kết quả.
+        `name`: tên hiển thị / gắn vào metrics khi job.output_path chỉ là file tạm.
+        """
+        outer = Future()
+        inner = self._ensure_executor().submit(_run_in_worker, job)
+        name = name or os.path.basename(job.output_path)
+
+        def done(f):
+            if f.cancelled():
+                outer.cancel()
+                return
+            if f.exception() is not None:
+                self._report(f"{label} Render lỗi: {f.exception()}", 0)
+                outer.set_exception(f.exception())
+                return
+            output_path, pid, stats, recorded = f.result()
+            self._caption_stats[pid] = stats
+            get_metrics().merge(recorded, video=name)
+            self._report(f"{label} Đã render xong {name}", 0.7)
+            outer.set_result(output_path)
+
+        inner.add_done_callback(done)
+        return outer
+
+    def caption_cache_stats(self):
+        """Gộp thống kê cache caption của mọi process worker"""
+        stats = list(self._caption_stats.values())
+        hits = sum(s["hits"] for s in stats)
+        misses = sum(s["misses"] for s in stats)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "workers": len(stats),
+        }
+
+    def render(self, job, label="", name=""):
+        """Render và chờ kết quả (dùng trong worker của pipeline)"""
+        return self.submit(job, label, name).result()
+
+    def render_many(self, jobs):
+        """Render cả lô job, trả về danh sách (job, đường dẫn hoặc exception)"""
+        futures = [(job, self.submit(job, f"({i+1}/{len(jobs)})")) for i, job in enumerate(jobs)]
+        results = []
+        for job, f in futures:
+            try:
+                results.append((job, f.result()))
+            except Exception as e:
+                results.append((job, e))
+        return results
+
+    def shutdown(self, cancel_pending=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+            self._executor = None
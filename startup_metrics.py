@@ -0,0 +1,42 @@
+"""
+Đo thời gian khởi động: import xong -> cửa sổ đầu tiên hiện lên.
+
+Chạy `TikTokVideoAI.exe --measure-startup` (hoặc `python main.py --measure-startup`):
+app tự đóng ngay khi cửa sổ hiện và ghi một dòng JSON vào startup_times.jsonl cạnh file chạy,
+dùng để theo dõi regression của bản PyInstaller --onedir.
+"""
+import json
+import os
+import sys
+import time
+
+MEASURE_FLAG = "--measure-startup"
+
+
+class StartupTimer:
+    def __init__(self, t0):
+        # t0: time.perf_counter() lấy ở dòng đầu tiên của main.py
+        self.t0 = t0
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - self.t0
+
+    def report(self, log_dir):
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "python": sys.version.split()[0],
+        }
+        record.update({k: round(v, 4) for k, v in self.marks.items()})
+        try:
+            with open(os.path.join(log_dir, "startup_times.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+        print(json.dumps(record))
+        return record
+
+
+def measure_requested(argv=None):
+    return MEASURE_FLAG in (sys.argv if argv is None else argv)
@@ -0,0 +1,205 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from encode_profiles import get_profile
+from ffmpeg_render import background_filter, get_ffmpeg_exe
+
+# Lấy mẫu bộ nhớ mỗi bao nhiêu frame (mặc định khoảng một lần mỗi giây video)
+MEMORY_SAMPLE_FRAMES = 30
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Render vượt ngân sách bộ nhớ đã cấu hình (RenderJob.memory_budget_mb)"""
+
+
+def process_rss(pid):
+    """Bộ nhớ thường trú (byte) của một process, None nếu không đo được trên máy này"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid}/status", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    if os.name == "nt":
+        return _windows_rss(pid)
+    return None
+
+
+def _windows_rss(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+    handle = ctypes.windll.kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    finally:
+        ctypes.windll.kernel32.CloseHandle(handle)
+
+
+class MemoryMonitor:
+    """Cộng bộ nhớ của process render và các process ffmpeg con, giữ mức đỉnh và so với ngân sách"""
+
+    def __init__(self, budget_mb=0):
+        self.budget = int(budget_mb * 1024 * 1024) if budget_mb else 0
+        self.pids = [os.getpid()]
+        self.peak = 0
+        self.measured = False
+
+    def sample(self):
+        total = 0
+        for pid in self.pids:
+            rss = process_rss(pid)
+            if rss is not None:
+                total += rss
+                self.measured = True
+        self.peak = max(self.peak, total)
+        if self.budget and total > self.budget:
+            raise MemoryBudgetExceeded(
+                f"Render dùng {total / 1024 ** 2:.0f}MB, vượt ngân sách {self.budget / 1024 ** 2:.0f}MB."
+            )
+        return total
+
+
+def supports(job):
+    try:
+        import numpy  # noqa: F401
+        import imageio_ffmpeg  # noqa: F401
+    except ImportError:
+        return False
+    return os.path.isfile(job.background_path)
+
+
+def _read_frame(stream, view):
+    """Đọc đúng một frame vào buffer có sẵn; False khi hết video"""
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            if got:
+                raise RuntimeError("ffmpeg trả về frame không đủ dữ liệu.")
+            return False
+        got += n
+    return True
+
+
+def _stderr_tail(f):
+    f.seek(0)
+    return f.read().decode(errors="replace").strip()[-500:]
+
+
+def render_job_stream(job, audio_mode="none", recorder=None):
+    """
+    Render theo luồng frame với bộ nhớ cố định:
+    ffmpeg giải mã và resize sẵn về khung đích (không đưa frame 4K qua Python),
+    mỗi frame được đọc vào MỘT buffer NumPy cấp phát trước, chèn caption tại chỗ
+    rồi ghi thẳng vào ffmpeg encode. Âm thanh gốc ghép lại sau bằng audio_mux.
+    """
+    import numpy as np
+    from audio_mux import mux_audio
+    from caption_render import get_renderer
+    from compositor import CaptionCompositor
+    from metrics import Recorder
+
+    recorder = recorder or Recorder()
+    target_w, target_h = job.size
+    profile = get_profile(job.profile)
+    monitor = MemoryMonitor(job.memory_budget_mb)
+    video_path = job.output_path if audio_mode == "none" else job.output_path + ".video.mp4"
+
+    with recorder.timer("render.caption"):
+        caption = get_renderer().render(
+            job.text, job.font_path, font_size=job.font_size, stroke_width=2, max_width=int(target_w * 0.9)
+        )
+        compositor = CaptionCompositor(caption, job.size)
+
+    frame = np.empty((target_h, target_w, 3), dtype=np.uint8)
+    view = memoryview(frame).cast("B")
+
+    vf = f"fps={job.fps}" if job.prenormalized else f"{background_filter(target_w, target_h)},fps={job.fps}"
+    decode_cmd = [
+        get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+        "-ss", str(job.start), "-i", job.background_path, "-t", str(job.duration),
+        "-vf", vf, "-an", "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+    ]
+    encode_cmd = [
+        get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{target_w}x{target_h}", "-r", str(job.fps),
+        "-i", "-", "-an", *profile.video_args(), video_path,
+    ]
+
+    frames = 0
+    with tempfile.TemporaryFile() as decode_err, tempfile.TemporaryFile() as encode_err:
+        decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=decode_err)
+        encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stderr=encode_err)
+        monitor.pids += [decoder.pid, encoder.pid]
+        try:
+            with recorder.timer("render.encode", backend="stream", profile=job.profile):
+                while _read_frame(decoder.stdout, view):
+                    compositor.apply(frame)
+                    try:
+                        encoder.stdin.write(view)
+                    except BrokenPipeError:
+                        encoder.wait()
+                        raise RuntimeError(f"ffmpeg encode lỗi: {_stderr_tail(encode_err)}")
+                    frames += 1
+                    if frames % MEMORY_SAMPLE_FRAMES == 1:
+                        monitor.sample()
+                encoder.stdin.close()
+                if encoder.wait() != 0:
+                    raise RuntimeError(f"ffmpeg encode lỗi: {_stderr_tail(encode_err)}")
+            if decoder.wait() != 0:
+                raise RuntimeError(f"ffmpeg giải mã lỗi: {_stderr_tail(decode_err)}")
+            if not frames:
+                raise RuntimeError("Không đọc được frame nào từ video nền.")
+        except BaseException:
+            for proc in (decoder, encoder):
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+            if os.path.exists(video_path):
+                os.remove(video_path)
+            raise
+        finally:
+            decoder.stdout.close()
+            if monitor.measured:
+                recorder.observe("render.peak_rss_mb", round(monitor.peak / 1024 ** 2, 1), backend="stream")
+
+    if audio_mode != "none":
+        try:
+            with recorder.timer("render.audio_mux", mode=audio_mode):
+                mux_audio(video_path, job.background_path, job.output_path, frames / job.fps, audio_mode,
+                          start=job.start, audio_bitrate=profile.audio_bitrate)
+        finally:
+            if os.path.exists(video_path):
+                os.remove(video_path)
+    return job.output_path
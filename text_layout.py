@@ -0,0 +1,189 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Caption chiếm tối đa 90% chiều ngang (giống khung chữ khi render) và 60% chiều cao khung hình
+CAPTION_WIDTH_RATIO = 0.9
+CAPTION_HEIGHT_RATIO = 0.6
+
+DEFAULT_FONT_SIZE = 50
+MIN_FONT_SIZE = 28
+FONT_SIZE_STEP = 2
+# Khoảng cách dòng mặc định của Pillow multiline_text
+LINE_SPACING = 4
+
+# Số layout caption nhớ lại mỗi process
+DEFAULT_CACHE_SIZE = 256
+
+
+def caption_box(size):
+    """(rộng, cao) tối đa của caption trên khung hình `size`"""
+    w, h = size
+    return int(w * CAPTION_WIDTH_RATIO), int(h * CAPTION_HEIGHT_RATIO)
+
+
+@dataclass(frozen=True)
+class CaptionLayout:
+    """Kết quả dàn trang: text đã xuống dòng, cỡ chữ đã chọn và kích thước ước tính (px)"""
+    text: str
+    font_size: int
+    width: float
+    height: float
+
+    @property
+    def lines(self):
+        return self.text.split("\n")
+
+
+class GlyphMetrics:
+    """Bề rộng từng ký tự / từng từ của một font ở một cỡ chữ, đo bằng Pillow và nhớ lại"""
+
+    def __init__(self, font, stroke_width=0):
+        self.font = font
+        self.stroke_width = stroke_width
+        self._glyphs = {}
+        self._words = {}
+        self.space = font.getlength(" ")
+        self.line_height = font.getbbox("A", stroke_width=stroke_width)[3] + stroke_width + LINE_SPACING
+
+    def glyph(self, ch):
+        width = self._glyphs.get(ch)
+        if width is None:
+            width = self._glyphs[ch] = self.font.getlength(ch)
+        return width
+
+    def word(self, word):
+        width = self._words.get(word)
+        if width is None:
+            width = self._words[word] = sum(self.glyph(ch) for ch in word)
+        return width
+
+
+class TextLayoutEngine:
+    """
+    Dàn trang caption theo bề rộng thật của glyph trong font (không đếm số ký tự):
+    chia dòng cân đối, tự giảm cỡ chữ cho vừa khung, nhớ bề rộng glyph theo (font, cỡ)
+    và nhớ cả layout đã tính, nên mỗi caption chỉ dàn trang một lần.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._metrics = {}
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def metrics(self, font_path, font_size, stroke_width=2):
+        key = (font_path, font_size, stroke_width)
+        m = self._metrics.get(key)
+        if m is None:
+            from caption_render import get_renderer
+            m = self._metrics[key] = GlyphMetrics(get_renderer().get_font(font_path, font_size), stroke_width)
+        return m
+
+    def layout(self, text, font_path, box, font_size=DEFAULT_FONT_SIZE, min_font_size=MIN_FONT_SIZE, stroke_width=2):
+        """Dàn caption vào khung `box` (rộng, cao); thử từ `font_size` giảm dần tới `min_font_size`"""
+        text = " ".join(unicodedata.normalize("NFC", text).split())
+        key = (text, font_path, tuple(box), font_size, min_font_size, stroke_width)
+        with self._lock:
+            cached = self._layouts.get(key)
+            if cached is not None:
+                self._layouts.move_to_end(key)
+                return cached
+
+            result = self._fit(text, font_path, box, font_size, min_font_size, stroke_width)
+            self._layouts[key] = result
+            while len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+            return result
+
+    def _fit(self, text, font_path, box, font_size, min_font_size, stroke_width):
+        max_w, max_h = box
+        words = text.split(" ") if text else []
+        size = font_size
+        while True:
+            m = self.metrics(font_path, size, stroke_width)
+            usable = max_w - 2 * stroke_width
+            last = size - FONT_SIZE_STEP < min_font_size
+            if last:
+                # Cỡ nhỏ nhất: từ dài hơn cả dòng được ngắt giữa các ký tự
+                words = [piece for w in words for piece in self._break_word(w, m, usable)]
+            widths = [m.word(w) for w in words]
+            if not widths or max(widths) <= usable:
+                lines = self._balance(words, widths, m.space, usable)
+                height = len(lines) * m.line_height - LINE_SPACING
+                if height <= max_h or last:
+                    width = max((self._line_width(line, widths, m.space) for line in lines), default=0)
+                    return CaptionLayout(
+                        "\n".join(" ".join(words[i] for i in line) for line in lines),
+                        size, width + 2 * stroke_width, height,
+                    )
+            size -= FONT_SIZE_STEP
+
+    @staticmethod
+    def _break_word(word, m, usable):
+        if m.word(word) <= usable:
+            return [word]
+        pieces, current, width = [], "", 0.0
+        for ch in word:
+            w = m.glyph(ch)
+            if current and width + w > usable:
+                pieces.append(current)
+                current, width = "", 0.0
+            current += ch
+            width += w
+        if current:
+            pieces.append(current)
+        return pieces
+
+    @staticmethod
+    def _line_width(line, widths, space):
+        return sum(widths[i] for i in line) + space * (len(line) - 1)
+
+    @staticmethod
+    def _wrap(widths, space, limit):
+        """Ngắt dòng tham lam theo bề rộng `limit`; trả về danh sách dòng (chỉ số từ)"""
+        lines, current, width = [], [], 0.0
+        for i, w in enumerate(widths):
+            extra = w if not current else width + space + w
+            if current and extra > limit:
+                lines.append(current)
+                current, width = [i], w
+            else:
+                current.append(i)
+                width = extra
+        if current:
+            lines.append(current)
+        return lines
+
+    def _balance(self, words, widths, space, usable):
+        """
+        Giữ số dòng tối thiểu của cách ngắt tham lam nhưng thu hẹp bề rộng dòng nhiều nhất có thể
+        (tìm nhị phân), để các dòng dài gần bằng nhau thay vì dòng cuối cụt lủn
+        """
+        if not words:
+            return []
+        target = len(self._wrap(widths, space, usable))
+        lo, hi = max(widths), usable
+        for _ in range(12):
+            mid = (lo + hi) / 2
+            if len(self._wrap(widths, space, mid)) <= target:
+                hi = mid
+            else:
+                lo = mid
+        return self._wrap(widths, space, hi)
+
+
+_default_engine = None
+
+
+def get_layout_engine():
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TextLayoutEngine()
+    return _default_engine
+
+
+def layout_caption(text, font_path, size=(720, 1280), **kwargs):
+    """Dàn caption cho khung hình `size`; xem TextLayoutEngine.layout"""
+    return get_layout_engine().layout(text, font_path, caption_box(size), **kwargs)
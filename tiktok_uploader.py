@@ -0,0 +1,178 @@
+import os
+import time
+import traceback
+
+UPLOAD_URL = "https://www.tiktok.com/tiktokstudio/upload"
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+FILE_INPUT = 'input[type="file"]'
+CAPTION_EDITOR = '.notranslate.public-DraftEditor-content'
+POST_BUTTON = 'button[data-e2e="post_video_button"]'
+
+# Nút Đăng sẵn sàng: hiện, không bị disable và không còn chữ "Uploading"
+_POST_READY_JS = """
+(sel) => {
+    const b = document.querySelector(sel);
+    if (!b || b.offsetParent === null) return false;
+    if (b.disabled || b.getAttribute('aria-disabled') === 'true') return false;
+    return !b.innerText.includes('Uploading');
+}
+"""
+
+# Đăng xong: trang rời khỏi màn upload hoặc nút Đăng biến mất
+_POST_DONE_JS = """
+(sel) => !location.href.includes('/upload') || !document.querySelector(sel)
+"""
+
+
+def get_pw_profile_dir():
+    path = os.path.join(os.environ.get("APPDATA", ""), "TikTokVideoAI", "pw_profile")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class UploadSession:
+    """
+    Giữ một persistent context Playwright sống suốt cả lô video và dùng lại page,
+    thay vì mở trình duyệt mới cho mỗi lần đăng. Chờ theo selector / sự kiện thay cho sleep cố định.
+    Mọi lời gọi phải nằm trên cùng một thread (yêu cầu của Playwright sync API).
+    """
+
+    def __init__(self, profile_dir=None, upload_url=UPLOAD_URL, headless=False, on_status=None,
+                 stealth=True, login_timeout=600000, upload_timeout=300000, post_timeout=120000):
+        self.profile_dir = profile_dir or get_pw_profile_dir()
+        self.upload_url = upload_url
+        self.headless = headless
+        self.on_status = on_status
+        self.stealth = stealth
+        self.login_timeout = login_timeout
+        self.upload_timeout = upload_timeout
+        self.post_timeout = post_timeout
+        # Thời gian từng bước của lần đăng gần nhất và của cả phiên (giây)
+        self.last_timings = {}
+        self.history = []
+        # Lần đăng gần nhất đã bấm nút Đăng chưa; đã bấm mà báo lỗi thì video có thể vẫn lên
+        self.post_clicked = False
+
+        self._playwright = None
+        self._context = None
+        self._page = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _report(self, text):
+        if self.on_status:
+            self.on_status(text)
+
+    def _open(self):
+        if self._page is not None:
+            return self._page
+
+        from playwright.sync_api import sync_playwright
+
+        self._playwright = sync_playwright().start()
+        self._context = self._playwright.chromium.launch_persistent_context(
+            user_data_dir=self.profile_dir,
+            headless=self.headless,
+            viewport={'width': 1280, 'height': 800},
+            user_agent=USER_AGENT,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--no-sandbox'
+            ]
+        )
+        page = self._context.pages[0] if self._context.pages else self._context.new_page()
+        page.set_default_timeout(120000)
+
+        if self.stealth:
+            try:
+                import playwright_stealth
+                playwright_stealth.stealth(page)
+            except Exception as e:
+                print(f"Stealth warning: {e}")
+
+        self._page = page
+        return page
+
+    def close(self):
+        try:
+            if self._context is not None:
+                self._context.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._page = self._context = self._playwright = None
+
+    def upload(self, video_path, description):
+        """Đăng một video, trả về True nếu đã bấm Đăng và trang xác nhận hoàn tất"""
+        timings = {}
+        self.last_timings = timings
+        self.post_clicked = False
+
+        def step(name, started):
+            timings[name] = time.perf_counter() - started
+            return time.perf_counter()
+
+        t = time.perf_counter()
+        try:
+            page = self._open()
+            t = step("browser", t)
+
+            self._report("Đang truy cập TikTok...")
+            page.goto(self.upload_url, wait_until="domcontentloaded")
+            if "login" in page.url:
+                self._report("Vui lòng đăng nhập TikTok trên trình duyệt để tiếp tục...")
+                try:
+                    page.wait_for_url("**/tiktokstudio/upload**", timeout=self.login_timeout)
+                except Exception:
+                    print("Login timeout")
+                    return False
+            t = step("navigate", t)
+
+            self._report("Đang tải video...")
+            file_input = page.locator(FILE_INPUT)
+            file_input.wait_for(state="attached", timeout=60000)
+            file_input.set_input_files(video_path)
+            t = step("attach_file", t)
+
+            self._report("Đang nhập mô tả...")
+            caption = page.locator(CAPTION_EDITOR)
+            caption.wait_for(state="visible", timeout=60000)
+            caption.click()
+            page.keyboard.press("Control+A")
+            page.keyboard.press("Backspace")
+            page.keyboard.type(description)
+            t = step("caption", t)
+
+            self._report("Chờ xử lý video...")
+            page.wait_for_function(_POST_READY_JS, arg=POST_BUTTON, timeout=self.upload_timeout)
+            t = step("processing", t)
+
+            page.locator(POST_BUTTON).click()
+            self.post_clicked = True
+            self._report("Đã nhấn nút Đăng!")
+            page.wait_for_function(_POST_DONE_JS, arg=POST_BUTTON, timeout=self.post_timeout)
+            step("post", t)
+            return True
+
+        except Exception:
+            print("-" * 30)
+            print("LỖI TIKTOK UPLOAD (PERSISTENT CONTEXT):")
+            traceback.print_exc()
+            print("-" * 30)
+            # Page có thể đang ở trạng thái hỏng: mở lại ở lần đăng sau
+            self.close()
+            return False
+        finally:
+            self.history.append(timings)
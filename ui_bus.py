@@ -0,0 +1,73 @@
+import queue
+import re
+import time
+import traceback
+
+# Nhãn "(i/n)" ở đầu thông báo trạng thái của từng video (xem pipeline.BatchItem.label)
+_JOB_LABEL_RE = re.compile(r"^\((\d+)/(\d+)\)\s*")
+
+# Tần số vẽ lại giao diện (khung hình / giây)
+DEFAULT_FPS = 15
+
+
+class UIBus:
+    """
+    Kênh gửi cập nhật giao diện từ thread worker sang thread Tk.
+    Worker chỉ đưa sự kiện vào hàng đợi (không chạm widget); thread Tk gọi drain()
+    theo nhịp cố định, gộp các sự kiện dồn lại thành một lần vẽ: chỉ trạng thái
+    mới nhất được hiển thị và mỗi video giữ một dòng trạng thái riêng.
+    """
+
+    def __init__(self, finished_linger=3.0, max_events=2000):
+        self._queue = queue.SimpleQueue()
+        # Giữ dòng của video đã xong thêm vài giây rồi mới ẩn
+        self.finished_linger = finished_linger
+        self.max_events = max_events
+        self.jobs = {}
+
+    def post(self, text, progress=None):
+        """Gọi được từ bất kỳ thread nào; cùng chữ ký với on_status(text, progress)"""
+        self._queue.put(("status", text, progress))
+
+    def call(self, func, *args, **kwargs):
+        """Chạy func(*args, **kwargs) trên thread Tk ở lần vẽ kế tiếp (ví dụ bật / tắt nút)"""
+        self._queue.put(("call", func, (args, kwargs)))
+
+    def drain(self):
+        """
+        Lấy hết sự kiện đang chờ (tối đa max_events mỗi lần để không giữ thread Tk quá lâu).
+        Trả về (trạng thái mới nhất (text, progress) hoặc None, có dòng video nào đổi không).
+        Các lệnh call() được chạy ngay tại đây, theo đúng thứ tự gửi.
+        """
+        status = None
+        jobs_changed = False
+        now = time.monotonic()
+        for _ in range(self.max_events):
+            try:
+                kind, a, b = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "call":
+                try:
+                    a(*b[0], **b[1])
+                except Exception:
+                    traceback.print_exc()
+                continue
+            status = (a, b)
+            m = _JOB_LABEL_RE.match(a)
+            if m:
+                self.jobs[int(m.group(1))] = (a, b, now)
+                jobs_changed = True
+
+        for index, (_, progress, updated) in list(self.jobs.items()):
+            if progress is not None and progress >= 1.0 and now - updated > self.finished_linger:
+                del self.jobs[index]
+                jobs_changed = True
+        return status, jobs_changed
+
+    def job_lines(self, limit=6):
+        """Dòng trạng thái của các video đang chạy, theo thứ tự trong lô"""
+        return [self.jobs[i][0] for i in sorted(self.jobs)[:limit]]
+
+    def clear_jobs(self):
+        self.jobs.clear()